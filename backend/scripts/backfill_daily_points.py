@@ -0,0 +1,16 @@
+from server import create_app
+from server.db import get_db
+from server.services import ScoreService
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        conn = get_db()
+        rows = ScoreService().rebuild_daily_points(conn)
+        conn.close()
+        print(f"Rebuilt student_daily_points: {rows} rows.")
+
+
+if __name__ == "__main__":
+    main()
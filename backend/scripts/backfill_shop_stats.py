@@ -0,0 +1,16 @@
+from server import create_app
+from server.db import get_db
+from server.services import ShopStatsService
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        conn = get_db()
+        rows = ShopStatsService().rebuild(conn)
+        conn.close()
+        print(f"Rebuilt reward_sales_daily: {rows} rows.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import argparse
+import asyncio
+import smtplib
+import threading
+import time
+from email.mime.text import MIMEText
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:  # only needed for this script
+    Controller = None
+
+from server.utils.mail import MailDispatcher
+
+
+# Sends a batch of messages to a local aiosmtpd server, once with a new
+# connection per message (the old reminder behaviour) and once through
+# MailDispatcher, and prints the throughput of each. --fail-every makes the
+# server answer 451 to every Nth message to exercise the retry path.
+
+
+class CountingHandler:
+    def __init__(self, fail_every: int = 0, delay: float = 0.0):
+        self.fail_every = fail_every
+        self.delay = delay
+        self.received = 0
+        self.attempts = 0
+        self._lock = threading.Lock()
+
+    async def handle_DATA(self, server, session, envelope):
+        with self._lock:
+            self.attempts += 1
+            attempt = self.attempts
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail_every and attempt % self.fail_every == 0:
+            return "451 Try again later"
+        with self._lock:
+            self.received += 1
+        return "250 OK"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="SMTP dispatch throughput against a local server.")
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--fail-every", type=int, default=0)
+    parser.add_argument("--delay", type=float, default=0.0, help="server-side seconds per message")
+    return parser.parse_args()
+
+
+def send_one_per_connection(host, port, count):
+    for index in range(count):
+        message = MIMEText("bench")
+        message["Subject"] = f"bench {index}"
+        message["From"] = "bench@example.com"
+        message["To"] = f"student{index}@example.com"
+        with smtplib.SMTP(host, port) as server:
+            server.sendmail("bench@example.com", [message["To"]], message.as_string())
+
+
+def send_pooled(host, port, count, workers):
+    failed = 0
+    with MailDispatcher(
+        host, port, "bench@example.com", starttls=False, workers=workers, backoff_seconds=0.05
+    ) as dispatcher:
+        futures = [
+            dispatcher.submit(f"student{index}@example.com", f"bench {index}", "bench")
+            for index in range(count)
+        ]
+        for future in futures:
+            if future.exception() is not None:
+                failed += 1
+    return failed
+
+
+def report(label, count, elapsed, handler):
+    print(
+        f"{label:<22} {count} messages in {elapsed:.2f}s  "
+        f"({count / elapsed:.1f}/s, server accepted {handler.received}, attempts {handler.attempts})"
+    )
+
+
+def main():
+    if Controller is None:
+        raise SystemExit("aiosmtpd is not installed: pip install aiosmtpd")
+
+    args = parse_args()
+    handler = CountingHandler(args.fail_every, args.delay)
+    controller = Controller(handler, hostname="127.0.0.1", port=args.port)
+    controller.start()
+    try:
+        if not args.fail_every:
+            started = time.perf_counter()
+            send_one_per_connection("127.0.0.1", args.port, args.messages)
+            report("connection per message", args.messages, time.perf_counter() - started, handler)
+
+        handler.received = handler.attempts = 0
+        started = time.perf_counter()
+        failed = send_pooled("127.0.0.1", args.port, args.messages, args.workers)
+        report(f"pooled x{args.workers}", args.messages, time.perf_counter() - started, handler)
+        if failed:
+            print(f"{failed} message(s) failed after retries")
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import argparse
+import threading
+import time
+
+from server import create_app
+from server.db import get_db
+from server.services import ServiceError, ShopService, TimeProvider
+
+
+# Fires concurrent purchases of one reward by one student and checks that the
+# final balance and the ledger agree with the number of successful purchases.
+# With --limited-reward-id the threads also buy a reward with a per student
+# limit, and the student must not end up with more of it than the limit.
+# It changes the student's points and writes purchases, so run it against a
+# scratch database.
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Concurrent reward purchase stress test.")
+    parser.add_argument("--student-id", type=int, required=True)
+    parser.add_argument("--reward-id", type=int, required=True)
+    parser.add_argument(
+        "--limited-reward-id", type=int, help="reward with perStudentLimit to buy alongside"
+    )
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--attempts", type=int, default=20, help="purchases per thread")
+    parser.add_argument("--starting-points", type=int, default=1000)
+    return parser.parse_args()
+
+
+def load_row(query, params):
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def set_points(student_id, points):
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("UPDATE users SET points = %s WHERE id = %s", (points, student_id))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def main():
+    args = parse_args()
+    app = create_app()
+
+    with app.app_context():
+        student = load_row(
+            "SELECT id, username, email, points FROM users WHERE id = %s AND role = 'student'",
+            (args.student_id,),
+        )
+        reward = load_row("SELECT id, cost FROM rewards WHERE id = %s", (args.reward_id,))
+        if not student or not reward:
+            raise SystemExit("Student or reward not found.")
+        rewards = [reward]
+        limited = None
+        if args.limited_reward_id is not None:
+            limited = load_row(
+                "SELECT id, cost, per_student_limit FROM rewards WHERE id = %s",
+                (args.limited_reward_id,),
+            )
+            if not limited or limited["per_student_limit"] is None:
+                raise SystemExit("Limited reward not found or has no perStudentLimit.")
+            rewards.append(limited)
+
+        set_points(student["id"], args.starting_points)
+        ledger_before = load_row(
+            "SELECT COUNT(*) AS total FROM reward_purchase_ledger WHERE student_id = %s",
+            (student["id"],),
+        )["total"]
+
+    results = {"ok": 0, "rejected": 0, "failed": 0}
+    spent = {"points": 0}
+    results_lock = threading.Lock()
+    start_barrier = threading.Barrier(args.threads)
+
+    def worker():
+        service = ShopService(clock=TimeProvider())
+        with app.app_context():
+            start_barrier.wait()
+            for attempt in range(args.attempts):
+                target = rewards[attempt % len(rewards)]
+                try:
+                    service.purchase_reward(student, target["id"])
+                    outcome = "ok"
+                except ServiceError as exc:
+                    outcome = "rejected" if exc.status in (400, 409) else "failed"
+                with results_lock:
+                    results[outcome] += 1
+                    if outcome == "ok":
+                        spent["points"] += target["cost"]
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        final_points = load_row(
+            "SELECT points FROM users WHERE id = %s", (student["id"],)
+        )["points"]
+        ledger_after = load_row(
+            "SELECT COUNT(*) AS total FROM reward_purchase_ledger WHERE student_id = %s",
+            (student["id"],),
+        )["total"]
+        limited_owned = None
+        if limited is not None:
+            limited_owned = load_row(
+                "SELECT COUNT(*) AS total FROM purchases WHERE reward_id = %s AND student_id = %s",
+                (limited["id"], student["id"]),
+            )["total"]
+
+    total = sum(results.values())
+    expected_points = args.starting_points - spent["points"]
+    print(f"attempts:   {total} over {args.threads} threads in {elapsed:.2f}s")
+    print(f"throughput: {total / elapsed:.1f} purchases/s")
+    print(f"succeeded:  {results['ok']}  rejected: {results['rejected']}  failed: {results['failed']}")
+    print(f"points:     final={final_points} expected={expected_points}")
+    print(f"ledger:     +{ledger_after - ledger_before} rows")
+    if limited is not None:
+        print(f"limited:    owned={limited_owned} limit={limited['per_student_limit']}")
+
+    consistent = (
+        final_points == expected_points
+        and ledger_after - ledger_before == results["ok"]
+        and final_points >= 0
+        and (limited is None or limited_owned <= limited["per_student_limit"])
+    )
+    print("consistent" if consistent else "INCONSISTENT")
+    if not consistent:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
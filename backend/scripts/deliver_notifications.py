@@ -0,0 +1,94 @@
+import argparse
+import time
+
+from server import create_app
+from server.services import OutboxService, ReminderService
+from server.utils.mail import MailDispatcher
+
+
+# Drains notification_outbox: claims a batch under a lease, sends it through
+# the SMTP pool and records which rows were sent, retried or dead-lettered.
+# Several copies can run at once; each claims different rows.
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Deliver queued notification emails.")
+    parser.add_argument("--once", action="store_true", help="exit when the outbox is empty")
+    parser.add_argument("--poll-seconds", type=float, default=15)
+    return parser.parse_args()
+
+
+def message_for(reminders, group):
+    # A digest is rendered from its claimed rows, which leave out tasks the
+    # student has submitted since it was queued.
+    if group[0]["digest_id"]:
+        return reminders.claimed_digest_message(group)
+    return group[0]["subject"], group[0]["body"]
+
+
+def deliver_batch(outbox, reminders, dispatcher, batch_size, lease_seconds):
+    lease_token, jobs = outbox.claim(batch_size, lease_seconds)
+    if not jobs:
+        return 0
+
+    # Rows of one digest share a single email and a single outcome.
+    groups = {}
+    for job in jobs:
+        groups.setdefault(job["digest_id"] or ("job", job["id"]), []).append(job)
+
+    futures = [
+        (group, dispatcher.submit(group[0]["to_address"], *message_for(reminders, group)))
+        for group in groups.values()
+    ]
+    sent = []
+    failed = []
+    for group, future in futures:
+        exc = future.exception()
+        if exc is None:
+            sent.extend(group)
+        else:
+            error = str(exc) or exc.__class__.__name__
+            failed.extend((job, error) for job in group)
+    outbox.complete(lease_token, sent, failed)
+    print(
+        f"Sent {len(futures)} email(s) covering {len(sent)} of {len(jobs)} claimed "
+        f"reminder(s); {len(failed)} failed."
+    )
+    return len(jobs)
+
+
+def main():
+    args = parse_args()
+    app = create_app()
+    with app.app_context():
+        config = app.config
+        if not config["SMTP_USER"] or not config["SMTP_PASSWORD"]:
+            raise RuntimeError("SMTP credentials are not configured.")
+
+        outbox = OutboxService(
+            max_attempts=config["OUTBOX_MAX_ATTEMPTS"],
+            retry_seconds=config["OUTBOX_RETRY_SECONDS"],
+        )
+        reminders = ReminderService(outbox=outbox)
+        with MailDispatcher.from_config(config) as dispatcher:
+            while True:
+                claimed = deliver_batch(
+                    outbox,
+                    reminders,
+                    dispatcher,
+                    config["OUTBOX_BATCH_SIZE"],
+                    config["OUTBOX_LEASE_SECONDS"],
+                )
+                if claimed:
+                    continue
+                if args.once:
+                    break
+                time.sleep(args.poll_seconds)
+
+        counts = outbox.counts()
+        if counts.get("dead"):
+            print(f"{counts['dead']} notification(s) are dead-lettered; see notification_outbox.last_error.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+from server import create_app
+from server.services import ChangeLogService, TimeProvider
+
+
+# Run daily. Clients whose /sync cursor is older than the retention get a 410
+# and reload everything.
+def main():
+    app = create_app()
+    with app.app_context():
+        days = app.config["CHANGE_LOG_RETENTION_DAYS"]
+        changes = ChangeLogService(TimeProvider(app.config["KST_OFFSET_HOURS"]))
+        removed = changes.prune(days)
+        print(f"Removed {removed} change_log row(s) older than {days} day(s).")
+
+
+if __name__ == "__main__":
+    main()
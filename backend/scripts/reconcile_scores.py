@@ -0,0 +1,33 @@
+from server import create_app
+from server.db import get_db
+from server.services import ScoreService
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        conn = get_db()
+        scores = ScoreService()
+
+        rebuilt = scores.rebuild(conn)
+        print(f"Rebuilt task_student_scores: {rebuilt} rows.")
+
+        drift = scores.diff_user_points(conn)
+        conn.close()
+
+        if not drift:
+            print("users.points matches earned minus spent points for every student.")
+            return
+
+        print(f"{len(drift)} student(s) differ from earned minus spent points:")
+        for row in drift:
+            print(
+                f"  {row['username']} (id {row['id']}): "
+                f"points={row['points']} earned={row['earned_points']} "
+                f"spent={row['spent_points']} expected={row['expected_points']} "
+                f"difference={row['difference']:+d}"
+            )
+
+
+if __name__ == "__main__":
+    main()
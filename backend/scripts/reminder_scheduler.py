@@ -0,0 +1,108 @@
+import heapq
+import time
+from datetime import timedelta
+
+import pymysql
+
+from server import create_app
+from server.db import get_db
+from server.services import ReminderService, TimeProvider
+
+
+# Resident replacement for the send_reminders cron job. Tasks write their
+# reminder times into reminder_schedule; this process keeps the upcoming ones
+# in a heap, sleeps until the next is due and queues its emails and in-app
+# notifications. Rows missed while it was down are still unfired, so they
+# are picked up on start as long as the deadline has not passed.
+# The schedule is re-read every REMINDER_REFRESH_SECONDS (a cheap indexed
+# read of the rows due before the next one) to see task changes made by the
+# web app. A failed read or fire is logged and retried; a reminder that failed
+# stays unfired in the table, so a later refresh loads it again.
+
+ENQUEUE_BATCH_SIZE = 500
+
+
+def fire(entry, reminders, clock):
+    fire_at, task_id, reminder_type, deadline = entry
+    if deadline <= clock.now():
+        # Too late to be useful; just retire it.
+        reminders.mark_fired(task_id, reminder_type, fire_at)
+        print(f"Skipped {reminder_type} reminder for task {task_id}: deadline passed.")
+        return
+
+    # Queue first, then mark: a crash in between re-queues on restart, and
+    # the outbox ignores reminders it already has.
+    conn = get_db(cursorclass=pymysql.cursors.SSDictCursor)
+    queued = 0
+    batch = []
+    try:
+        for row in reminders.candidates(conn, reminder_type, task_id=task_id):
+            batch.append((row, reminder_type))
+            if len(batch) >= ENQUEUE_BATCH_SIZE:
+                queued += reminders.enqueue(batch)
+                batch = []
+        queued += reminders.enqueue(batch)
+    finally:
+        conn.close()
+    reminders.mark_fired(task_id, reminder_type, fire_at)
+    late = clock.now() - fire_at
+    print(
+        f"Queued {queued} {reminder_type} reminder(s) for task {task_id} "
+        f"({late.total_seconds():.0f}s after fire time)."
+    )
+
+
+def load_heap(reminders, horizon):
+    heap = [
+        (row["fire_at"], row["task_id"], row["reminder_type"], row["deadline"])
+        for row in reminders.pending(horizon)
+    ]
+    heapq.heapify(heap)
+    return heap
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        refresh_seconds = app.config["REMINDER_REFRESH_SECONDS"]
+        retry_seconds = app.config["REMINDER_RETRY_SECONDS"]
+        clock = TimeProvider(app.config["KST_OFFSET_HOURS"])
+        reminders = ReminderService(clock)
+
+        added = reminders.backfill_schedule()
+        if added:
+            print(f"Scheduled reminders for {added} existing task reminder(s).")
+
+        heap = []
+        next_refresh = clock.now()
+        while True:
+            now = clock.now()
+            if now >= next_refresh:
+                # Rows due after the next refresh are loaded by that refresh.
+                try:
+                    heap = load_heap(reminders, now + timedelta(seconds=refresh_seconds))
+                    next_refresh = now + timedelta(seconds=refresh_seconds)
+                except Exception as exc:
+                    print("Failed to load the reminder schedule:", type(exc).__name__, exc)
+                    next_refresh = now + timedelta(seconds=retry_seconds)
+
+            while heap and heap[0][0] <= now:
+                entry = heapq.heappop(heap)
+                try:
+                    fire(entry, reminders, clock)
+                except Exception as exc:
+                    # Still unfired in the table, so the next refresh loads it
+                    # again; the rest of the heap goes on firing meanwhile.
+                    print(
+                        f"Failed to fire {entry[2]} reminder for task {entry[1]}:",
+                        type(exc).__name__,
+                        exc,
+                    )
+                now = clock.now()
+
+            wake_at = min(heap[0][0], next_refresh) if heap else next_refresh
+            time.sleep(max((wake_at - clock.now()).total_seconds(), 0))
+
+
+if __name__ == "__main__":
+    main()
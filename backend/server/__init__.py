@@ -2,12 +2,31 @@ from flask import Flask
 from flask_cors import CORS
 import pymysql
 
+from .cache import CacheBackends
 from .config import Config
-from .extensions import bcrypt
+from .extensions import (
+    bcrypt,
+    event_bus,
+    progress_cache,
+    query_cache,
+    ranked_leaderboard,
+    reward_catalog,
+    shared_reads,
+    sold_out_rewards,
+    unread_notifications,
+)
+from .services import StudentService
 from .routes.auth import auth_bp
 from .routes.tasks import tasks_bp
 from .routes.students import students_bp
 from .routes.shop import shop_bp
+from .routes.notifications import notifications_bp
+from .routes.dashboard import dashboard_bp
+from .routes.batch import batch_bp
+from .routes.events import events_bp
+from .routes.sync import sync_bp
+from .routes.metrics import metrics_bp
+from .db import close_shared_db
 import os
 
 
@@ -26,12 +45,50 @@ def create_app():
         allow_headers=["Content-Type", "Authorization"],
     )
 
+    backends = CacheBackends(app.config["CACHE_REDIS_URL"], app.config["CACHE_KEY_PREFIX"])
+    user_backend = backends.get(app.config["USER_CACHE_BACKEND"])
+    catalog_backend = backends.get(app.config["REWARD_CATALOG_CACHE_BACKEND"])
+
     bcrypt.init_app(app)
+    ranked_leaderboard.init_app(
+        app, backend=backends.get(app.config["LEADERBOARD_CACHE_BACKEND"])
+    )
+    progress_cache.configure(
+        app.config["PROGRESS_CACHE_SIZE"],
+        app.config["PROGRESS_CACHE_TTL_SECONDS"],
+        backend=user_backend,
+    )
+    sold_out_rewards.configure(
+        1024, app.config["SOLD_OUT_CACHE_TTL_SECONDS"], backend=catalog_backend
+    )
+    reward_catalog.configure(app.config["REWARD_CATALOG_TTL_SECONDS"], backend=catalog_backend)
+    unread_notifications.configure(
+        4096, app.config["UNREAD_CACHE_TTL_SECONDS"], backend=user_backend
+    )
+    event_bus.queue_size = app.config["EVENTS_QUEUE_SIZE"]
+    shared_reads.configure(app.config["SINGLE_FLIGHT_TTL_SECONDS"])
+    # A score change must not be answered with a board built before it.
+    ranked_leaderboard.on_change(
+        lambda: shared_reads.forget(StudentService.LEADERBOARD_FLIGHT)
+    )
+    query_cache.configure(
+        app.config["QUERY_CACHE_SIZE"],
+        app.config["QUERY_CACHE_TTL_SECONDS"],
+        backend=backends.get(app.config["CACHE_BACKEND"]),
+    )
+    backends.start()
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(tasks_bp)
     app.register_blueprint(students_bp)
     app.register_blueprint(shop_bp)
+    app.register_blueprint(notifications_bp)
+    app.register_blueprint(dashboard_bp)
+    app.register_blueprint(batch_bp)
+    app.register_blueprint(events_bp)
+    app.register_blueprint(sync_bp)
+    app.register_blueprint(metrics_bp)
+    app.teardown_appcontext(close_shared_db)
 
     @app.get("/")
     def index():
@@ -0,0 +1,556 @@
+from __future__ import annotations
+
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Hashable, Optional
+
+from flask import g, has_app_context
+
+try:
+    import redis
+except ImportError:  # only needed for the redis cache backend
+    redis = None
+
+
+_MISSING = object()
+
+
+class LocalCache:
+    # Per-process LRU with an optional TTL. Values are returned as stored, so
+    # callers must not mutate what they get back.
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, tuple[Optional[float], Any]] = OrderedDict()
+
+    def configure(self, max_entries: int, ttl_seconds: Optional[float]) -> None:
+        with self._lock:
+            self.max_entries = max_entries
+            self.ttl_seconds = ttl_seconds
+            self._evict()
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value, ttl_seconds: Optional[float] = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def delete(self, *keys: Hashable) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class Cache:
+    # A named cache in front of a swappable store: its own LocalCache by
+    # default, or a namespace of a backend shared by every worker (see
+    # configure). Callers see the LocalCache interface either way.
+    def __init__(self, name: str, max_entries: int = 1024, ttl_seconds: Optional[float] = None):
+        self.name = name
+        self.store = LocalCache(max_entries, ttl_seconds)
+
+    def configure(self, max_entries: int, ttl_seconds: Optional[float], backend=None) -> None:
+        if backend is None:
+            self.store.configure(max_entries, ttl_seconds)
+        else:
+            self.store = backend.namespace(self.name, max_entries, ttl_seconds)
+
+    def get(self, key: Hashable, default=None):
+        return self.store.get(key, default)
+
+    def set(self, key: Hashable, value, ttl_seconds: Optional[float] = None) -> None:
+        self.store.set(key, value, ttl_seconds)
+
+    def delete(self, *keys: Hashable) -> None:
+        self.store.delete(*keys)
+
+    def clear(self) -> None:
+        self.store.clear()
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+
+class StudentProgressCache(Cache):
+    def progress_key(self, student_id: int) -> tuple:
+        return ("progress", student_id)
+
+    def tasks_key(self, student_id: int) -> tuple:
+        return ("tasks", student_id)
+
+    def invalidate_student(self, student_id: int) -> None:
+        self.delete(self.progress_key(student_id), self.tasks_key(student_id))
+
+
+class RewardCatalogCache:
+    # Holds the serialized /rewards body for the current catalog version.
+    # Writers bump the version; the next reader rebuilds. On a local backend
+    # the TTL bounds how long a worker can serve a catalog changed through
+    # another worker; on a shared one every worker sees the same version.
+    VERSION_KEY = "reward_catalog:version"
+
+    def __init__(self, ttl_seconds: Optional[float] = 30):
+        self.ttl_seconds = ttl_seconds
+        self.backend = LocalBackend()
+        self._built = self.backend.namespace("reward_catalog", 1, None)
+
+    def configure(self, ttl_seconds: Optional[float], backend=None) -> None:
+        self.ttl_seconds = ttl_seconds
+        if backend is not None:
+            self.backend = backend
+            self._built = backend.namespace("reward_catalog", 1, None)
+
+    def etag(self, version: int) -> str:
+        return f"rewards-{self.backend.epoch}-{version}"
+
+    def bump(self) -> int:
+        return self.backend.incr(self.VERSION_KEY)
+
+    def lookup(self) -> tuple[int, Optional[bytes]]:
+        # An expired build moves to a new version so clients holding the old
+        # ETag refetch rather than revalidating against a possibly stale body.
+        version = self.backend.counter(self.VERSION_KEY)
+        built = self._built.get("built")
+        if built is None or built[0] != version:
+            return version, None
+        if self.ttl_seconds and time.time() - built[1] >= self.ttl_seconds:
+            return self.bump(), None
+        return version, built[2]
+
+    def store(self, version: int, payload: bytes) -> None:
+        # A bump landing after this check leaves a build for an old version,
+        # which lookup never serves.
+        if version == self.backend.counter(self.VERSION_KEY):
+            self._built.set("built", (version, time.time(), payload))
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    # Concurrent calls with the same key share one execution, and its result
+    # is reused for ttl_seconds so a burst that arrives just after does not
+    # start another. Keys are tuples whose first item names the read; stats
+    # are kept per name.
+    def __init__(self, ttl_seconds: float = 2.0, max_entries: int = 1024):
+        self._lock = threading.Lock()
+        self._flights: dict[Hashable, _Flight] = {}
+        self._results = LocalCache(max_entries, ttl_seconds)
+        self._stats: dict[str, dict[str, int]] = {}
+
+    def configure(self, ttl_seconds: float, max_entries: int = 1024) -> None:
+        self._results.configure(max_entries, ttl_seconds)
+
+    def do(self, key: tuple, fn: Callable[[], Any]):
+        result = self._results.get(key, _MISSING)
+        if result is not _MISSING:
+            self._count(key, "cached")
+            return result
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+        if not leader:
+            self._count(key, "joined")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        self._count(key, "executed")
+        try:
+            flight.result = fn()
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                # A forget() during the call detached this flight; its result
+                # may predate the write, so it is not kept.
+                current = self._flights.get(key) is flight
+                if current:
+                    del self._flights[key]
+            if current and flight.error is None:
+                self._results.set(key, flight.result)
+            flight.done.set()
+        return flight.result
+
+    def forget(self, *keys: tuple) -> None:
+        # Writers call this so later reads start fresh instead of joining a
+        # call that began before the write.
+        with self._lock:
+            for key in keys:
+                self._flights.pop(key, None)
+        self._results.delete(*keys)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            stats = {name: dict(counts) for name, counts in self._stats.items()}
+        for counts in stats.values():
+            calls = counts.get("executed", 0) + counts.get("joined", 0) + counts.get("cached", 0)
+            counts["calls"] = calls
+            counts["coalescingRatio"] = (
+                round(1 - counts.get("executed", 0) / calls, 4) if calls else 0.0
+            )
+        return stats
+
+    def _count(self, key: tuple, outcome: str) -> None:
+        with self._lock:
+            counts = self._stats.setdefault(str(key[0]), {})
+            counts[outcome] = counts.get(outcome, 0) + 1
+
+
+class QueryCache:
+    # Results of service reads keyed by their arguments and the version of
+    # every table they read. Writers bump the tables they wrote, which makes
+    # the old entries unreachable; LRU eviction clears them out. Entries and
+    # versions are per process; on a shared backend bumps are broadcast to the
+    # other workers, otherwise the TTL bounds how long a write made by another
+    # worker or a script can go unseen.
+    CHANNEL = "query_cache"
+
+    def __init__(self, max_entries: int = 4096, ttl_seconds: Optional[float] = 30):
+        self._lock = threading.Lock()
+        self._versions: dict[str, int] = {}
+        self._entries = LocalCache(max_entries, ttl_seconds)
+        self._stats: dict[str, dict[str, int]] = {}
+        self.backend = None
+
+    def configure(self, max_entries: int, ttl_seconds: Optional[float], backend=None) -> None:
+        self._entries.configure(max_entries, ttl_seconds)
+        if backend is not None:
+            self.backend = backend
+            backend.subscribe(self.CHANNEL, lambda tables: self._bump_local(tables))
+
+    def versions(self, tables: tuple) -> tuple:
+        with self._lock:
+            return tuple(self._versions.get(table, 0) for table in tables)
+
+    def bump(self, *tables: str) -> None:
+        self._bump_local(tables)
+        if self.backend is not None:
+            self.backend.broadcast(self.CHANNEL, tables)
+
+    def _bump_local(self, tables) -> None:
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def get_or_compute(
+        self, name: str, tables: tuple, args_key: Hashable, compute: Callable[[], Any]
+    ):
+        # Versions are read before computing: a write landing mid-read bumps
+        # past this key, so a result that may predate it is never served again.
+        key = (name, args_key, self.versions(tables))
+        value = self._entries.get(key, _MISSING)
+        if value is not _MISSING:
+            self._count(name, "hits")
+            return value
+        self._count(name, "misses")
+        value = compute()
+        self._entries.set(key, value)
+        return value
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            methods = {name: dict(counts) for name, counts in self._stats.items()}
+            versions = dict(self._versions)
+        for counts in methods.values():
+            total = counts.get("hits", 0) + counts.get("misses", 0)
+            counts["hitRatio"] = round(counts.get("hits", 0) / total, 4) if total else 0.0
+        return {
+            "entries": len(self._entries),
+            "maxEntries": self._entries.max_entries,
+            "methods": methods,
+            "tableVersions": versions,
+        }
+
+    def _count(self, name: str, outcome: str) -> None:
+        with self._lock:
+            counts = self._stats.setdefault(name, {})
+            counts[outcome] = counts.get(outcome, 0) + 1
+
+
+def _freeze(value) -> Hashable:
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def validated_version():
+    # The change_log version the current request's ETag is built from, set by
+    # @conditional while its view runs; None outside such a view.
+    return g.get("validated_version") if has_app_context() else None
+
+
+def reads(*tables: str, key: Optional[Callable[..., Hashable]] = None):
+    # Marks a service method as a cacheable read of tables. The service opts
+    # in by having a query_cache; key(*args, **kwargs) picks the arguments
+    # that matter (default: all of them). Under an ETag the change_log version
+    # is part of the key too: table bumps from other workers arrive late, and
+    # a stale body sent with the new ETag would be answered 304 until the
+    # next write.
+    def decorator(method):
+        name = method.__qualname__
+
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            cache = getattr(self, "query_cache", None)
+            if cache is None:
+                return method(self, *args, **kwargs)
+            args_key = key(*args, **kwargs) if key is not None else _freeze((args, kwargs))
+            args_key = (args_key, validated_version())
+            return cache.get_or_compute(
+                name, tables, args_key, lambda: method(self, *args, **kwargs)
+            )
+
+        wrapper.tables = tables
+        return wrapper
+
+    return decorator
+
+
+class LocalBackend:
+    # Everything stays in this process: each cache gets its own LocalCache and
+    # broadcasts go nowhere. Right for a single worker.
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, int] = {}
+        self.epoch = uuid.uuid4().hex[:8]
+
+    def namespace(self, name: str, max_entries: int, ttl_seconds: Optional[float]) -> LocalCache:
+        return LocalCache(max_entries, ttl_seconds)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def counter(self, key: str) -> int:
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def broadcast(self, channel: str, message) -> None:
+        pass
+
+    def subscribe(self, channel: str, callback: Callable[[Any], None]) -> None:
+        pass
+
+    def start(self) -> None:
+        pass
+
+
+class RedisBackend:
+    # Entries and counters live in a Redis (or anything speaking its protocol)
+    # on the same host, so every worker reads what any worker wrote.
+    # broadcast() reaches the other workers through pub/sub for state that has
+    # to stay in process. Values are pickled: only point this at a server the
+    # app alone talks to. A Redis error reads as a miss rather than failing
+    # the request.
+    shared = True
+
+    def __init__(self, url: str, prefix: str = "tutor"):
+        if redis is None:
+            raise RuntimeError(
+                "The redis cache backend needs the redis package (pip install redis)."
+            )
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._sender = uuid.uuid4().hex
+        self._subscribers: dict[str, list[Callable[[Any], None]]] = {}
+        self._listener = None
+
+    @property
+    def epoch(self) -> str:
+        # Changes whenever Redis starts empty, so counters restarting from 0
+        # never repeat a version handed out before.
+        key = self.key("epoch")
+        try:
+            value = self.client.get(key)
+            if value is None:
+                self.client.set(key, uuid.uuid4().hex[:8], nx=True)
+                value = self.client.get(key)
+        except redis.RedisError as exc:
+            print("Cache backend error:", type(exc).__name__, exc)
+            return "offline"
+        return value.decode("utf-8")
+
+    def key(self, name: str) -> str:
+        return f"{self.prefix}:{name}"
+
+    def namespace(self, name: str, max_entries: int, ttl_seconds: Optional[float]) -> RedisCache:
+        # Redis' own maxmemory policy bounds the size, not max_entries.
+        return RedisCache(self, self.key(name), ttl_seconds)
+
+    def incr(self, key: str) -> int:
+        try:
+            return int(self.client.incr(self.key(key)))
+        except redis.RedisError as exc:
+            print("Cache backend error:", type(exc).__name__, exc)
+            return 0
+
+    def counter(self, key: str) -> int:
+        try:
+            return int(self.client.get(self.key(key)) or 0)
+        except redis.RedisError as exc:
+            print("Cache backend error:", type(exc).__name__, exc)
+            return 0
+
+    def broadcast(self, channel: str, message) -> None:
+        # Other workers only; the sender has already applied the change.
+        try:
+            self.client.publish(self.key(channel), pickle.dumps((self._sender, message)))
+        except redis.RedisError as exc:
+            print("Cache broadcast error:", type(exc).__name__, exc)
+
+    def subscribe(self, channel: str, callback: Callable[[Any], None]) -> None:
+        self._subscribers.setdefault(self.key(channel), []).append(callback)
+
+    def start(self) -> None:
+        # Called once every cache has subscribed. The listener is a thread of
+        # this process, so start it after forking (gunicorn without --preload).
+        if self._listener is not None or not self._subscribers:
+            return
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{channel: self._deliver for channel in self._subscribers})
+        self._listener = pubsub.run_in_thread(
+            sleep_time=1.0, daemon=True, exception_handler=self._listener_failed
+        )
+
+    def _deliver(self, message: dict) -> None:
+        sender, payload = pickle.loads(message["data"])
+        if sender == self._sender:
+            return
+        channel = message["channel"].decode("utf-8")
+        for callback in self._subscribers.get(channel, []):
+            callback(payload)
+
+    def _listener_failed(self, exc, pubsub, thread) -> None:
+        # Broadcasts missed while disconnected are covered by each cache's TTL.
+        print("Cache broadcast listener error:", type(exc).__name__, exc)
+        time.sleep(1.0)
+
+
+class RedisCache:
+    # The LocalCache interface over one namespace of a RedisBackend.
+    def __init__(self, backend: RedisBackend, prefix: str, ttl_seconds: Optional[float] = None):
+        self.client = backend.client
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = None
+
+    def configure(self, max_entries: int, ttl_seconds: Optional[float]) -> None:
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key: Hashable, default=None):
+        try:
+            raw = self.client.get(self._key(key))
+        except redis.RedisError as exc:
+            print("Cache backend error:", type(exc).__name__, exc)
+            return default
+        return default if raw is None else pickle.loads(raw)
+
+    def set(self, key: Hashable, value, ttl_seconds: Optional[float] = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        try:
+            self.client.set(
+                self._key(key), pickle.dumps(value), px=int(ttl * 1000) if ttl else None
+            )
+        except redis.RedisError as exc:
+            print("Cache backend error:", type(exc).__name__, exc)
+
+    def delete(self, *keys: Hashable) -> None:
+        if not keys:
+            return
+        try:
+            self.client.delete(*(self._key(key) for key in keys))
+        except redis.RedisError as exc:
+            print("Cache backend error:", type(exc).__name__, exc)
+
+    def clear(self) -> None:
+        try:
+            keys = list(self._scan())
+            if keys:
+                self.client.delete(*keys)
+        except redis.RedisError as exc:
+            print("Cache backend error:", type(exc).__name__, exc)
+
+    def __len__(self) -> int:
+        try:
+            return sum(1 for _ in self._scan())
+        except redis.RedisError:
+            return 0
+
+    def _scan(self):
+        return self.client.scan_iter(match=f"{self.prefix}:*", count=500)
+
+    def _key(self, key: Hashable) -> str:
+        # Keys are tuples of ids and short strings, whose repr is stable.
+        return f"{self.prefix}:{key!r}"
+
+
+class CacheBackends:
+    # One backend per kind, so every cache on "redis" shares one client and
+    # one broadcast listener.
+    def __init__(self, redis_url: str, prefix: str = "tutor"):
+        self.redis_url = redis_url
+        self.prefix = prefix
+        self._backends: dict[str, Any] = {}
+
+    def get(self, kind: str):
+        if kind not in self._backends:
+            if kind == "local":
+                self._backends[kind] = LocalBackend()
+            elif kind == "redis":
+                self._backends[kind] = RedisBackend(self.redis_url, self.prefix)
+            else:
+                raise ValueError(f"Unknown cache backend {kind!r}; use 'local' or 'redis'.")
+        return self._backends[kind]
+
+    def start(self) -> None:
+        for backend in self._backends.values():
+            backend.start()
@@ -50,5 +50,60 @@ class Config:
     SMTP_USER = os.getenv("SMTP_USER", "")
     SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
     SMTP_SENDER = os.getenv("SMTP_SENDER", SMTP_USER)
+    SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+    SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+    SMTP_MAX_ATTEMPTS = int(os.getenv("SMTP_MAX_ATTEMPTS", "3"))
+
+    OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+    OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "300"))
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+    OUTBOX_RETRY_SECONDS = int(os.getenv("OUTBOX_RETRY_SECONDS", "60"))
+    # The scheduler re-reads reminder_schedule this often (new or moved tasks
+    # are seen within it) and waits this long after a failed read or fire.
+    REMINDER_REFRESH_SECONDS = int(os.getenv("REMINDER_REFRESH_SECONDS", "15"))
+    REMINDER_RETRY_SECONDS = int(os.getenv("REMINDER_RETRY_SECONDS", "10"))
 
     KST_OFFSET_HOURS = 9
+
+    BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+    BATCH_TIME_BUDGET_SECONDS = float(os.getenv("BATCH_TIME_BUDGET_SECONDS", "5"))
+
+    LEADERBOARD_IN_MEMORY = os.getenv("LEADERBOARD_IN_MEMORY", "true").lower() == "true"
+    LEADERBOARD_RECONCILE_SECONDS = int(os.getenv("LEADERBOARD_RECONCILE_SECONDS", "300"))
+
+    # Where caches keep their entries: "local" (each worker on its own) or
+    # "redis" (one Redis on this host shared by every worker; needs
+    # `pip install redis`). The leaderboard, reward catalog (with sold-out
+    # flags) and per-user caches (progress, unread counts) can be switched
+    # one by one; the query cache only uses the backend to broadcast.
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "local")
+    CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://127.0.0.1:6379/0")
+    CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "tutor")
+    LEADERBOARD_CACHE_BACKEND = os.getenv("LEADERBOARD_CACHE_BACKEND", CACHE_BACKEND)
+    REWARD_CATALOG_CACHE_BACKEND = os.getenv("REWARD_CATALOG_CACHE_BACKEND", CACHE_BACKEND)
+    USER_CACHE_BACKEND = os.getenv("USER_CACHE_BACKEND", CACHE_BACKEND)
+
+    PROGRESS_CACHE_SIZE = int(os.getenv("PROGRESS_CACHE_SIZE", "2048"))
+    PROGRESS_CACHE_TTL_SECONDS = int(os.getenv("PROGRESS_CACHE_TTL_SECONDS", "60"))
+
+    # How long a worker trusts its own "sold out" flag before asking MySQL again
+    # (covers restocks made through another worker).
+    SOLD_OUT_CACHE_TTL_SECONDS = int(os.getenv("SOLD_OUT_CACHE_TTL_SECONDS", "30"))
+    REWARD_CATALOG_TTL_SECONDS = int(os.getenv("REWARD_CATALOG_TTL_SECONDS", "30"))
+    # Leaderboard, reward list and students overview results are shared by
+    # concurrent requests and reused this long.
+    SINGLE_FLIGHT_TTL_SECONDS = float(os.getenv("SINGLE_FLIGHT_TTL_SECONDS", "2"))
+    # Service read results keyed on table versions. Writes through this worker
+    # invalidate at once; writes elsewhere show up within the TTL.
+    QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "4096"))
+    QUERY_CACHE_TTL_SECONDS = int(os.getenv("QUERY_CACHE_TTL_SECONDS", "30"))
+    # Reminder scripts write notifications from another process, so cached
+    # unread counts are only trusted this long.
+    UNREAD_CACHE_TTL_SECONDS = int(os.getenv("UNREAD_CACHE_TTL_SECONDS", "30"))
+
+    # /events streams send a keep-alive comment when idle this long, and drop
+    # to a "resync" event once this many events are waiting unread.
+    EVENTS_HEARTBEAT_SECONDS = int(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+    EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+
+    CHANGE_LOG_RETENTION_DAYS = int(os.getenv("CHANGE_LOG_RETENTION_DAYS", "30"))
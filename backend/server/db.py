@@ -1,13 +1,53 @@
 import pymysql
-from flask import current_app
+from flask import current_app, g, has_app_context
 
 
-def get_db():
+class _SharedConnection:
+    # The request's shared connection as handed to services: they close what
+    # get_db() gives them, so close() here leaves the real one open until
+    # the app context tears down.
+    def __init__(self, conn):
+        self._conn = conn
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def _connect(cursorclass, autocommit=False):
     return pymysql.connect(
         host=current_app.config["DB_HOST"],
         port=current_app.config["DB_PORT"],
         user=current_app.config["DB_USER"],
         password=current_app.config["DB_PASSWORD"],
         database=current_app.config["DB_NAME"],
-        cursorclass=pymysql.cursors.DictCursor,
+        cursorclass=cursorclass,
+        autocommit=autocommit,
     )
+
+
+def get_db(cursorclass=pymysql.cursors.DictCursor):
+    shared = g.get("shared_db") if has_app_context() else None
+    if shared is not None and cursorclass is pymysql.cursors.DictCursor:
+        return _SharedConnection(shared)
+    return _connect(cursorclass)
+
+
+def share_request_db() -> None:
+    # After this, every get_db() in the current request reuses one
+    # connection. pymysql runs one query at a time per connection, so
+    # callers using it must not overlap queries (e.g. from threads). It is
+    # only used for read-only requests and runs in autocommit, so each read
+    # sees the latest commits instead of the snapshot taken by the first
+    # query (the auth lookup), which @reads would otherwise cache under a
+    # newer version.
+    if g.get("shared_db") is None:
+        g.shared_db = _connect(pymysql.cursors.DictCursor, autocommit=True)
+
+
+def close_shared_db(_exc=None) -> None:
+    conn = g.pop("shared_db", None)
+    if conn is not None:
+        conn.close()
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import json
+import queue
+import threading
+from typing import Iterable, Optional
+
+
+class Subscription:
+    def __init__(self, user_id: int, role: str, queue_size: int):
+        self.user_id = user_id
+        self.role = role
+        self._queue: queue.Queue[str] = queue.Queue(maxsize=queue_size)
+        self._overflowed = False
+
+    def wants(self, user_ids: Optional[set], roles: Optional[tuple]) -> bool:
+        if user_ids is None and roles is None:
+            return True
+        return (user_ids is not None and self.user_id in user_ids) or (
+            roles is not None and self.role in roles
+        )
+
+    def put(self, message: str) -> None:
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            self._overflowed = True
+
+    def get(self, timeout: float) -> Optional[str]:
+        # A client that fell behind lost events, so it is told to refetch
+        # everything instead of being sent a partial stream.
+        if self._overflowed:
+            self._overflowed = False
+            self._drain()
+            return EventBus.format("resync", {})
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _drain(self) -> None:
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+
+class EventBus:
+    # Per-process fan-out for /events. Services publish small "something
+    # changed" hints after their commit; each open stream has a bounded queue
+    # so a slow client never blocks the request that published.
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers: set[Subscription] = set()
+
+    def subscribe(self, user: dict) -> Subscription:
+        subscription = Subscription(user["id"], user["role"], self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(
+        self,
+        event: str,
+        data: Optional[dict] = None,
+        user_ids: Optional[Iterable[int]] = None,
+        roles: Optional[tuple] = None,
+    ) -> int:
+        # With neither user_ids nor roles the event goes to everyone.
+        message = self.format(event, data or {})
+        user_ids = set(user_ids) if user_ids is not None else None
+        with self._lock:
+            targets = [s for s in self._subscribers if s.wants(user_ids, roles)]
+        for subscription in targets:
+            subscription.put(message)
+        return len(targets)
+
+    @staticmethod
+    def format(event: str, data: dict) -> str:
+        return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
@@ -1,3 +1,21 @@
 from flask_bcrypt import Bcrypt
 
+from .cache import (
+    Cache,
+    QueryCache,
+    RewardCatalogCache,
+    SingleFlight,
+    StudentProgressCache,
+)
+from .events import EventBus
+from .leaderboard import RankedLeaderboard
+
 bcrypt = Bcrypt()
+ranked_leaderboard = RankedLeaderboard()
+progress_cache = StudentProgressCache("progress")
+sold_out_rewards = Cache("sold_out_rewards")
+reward_catalog = RewardCatalogCache()
+unread_notifications = Cache("unread_notifications")
+event_bus = EventBus()
+shared_reads = SingleFlight()
+query_cache = QueryCache()
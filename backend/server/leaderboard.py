@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from typing import Callable, Iterable, Optional
+
+
+class RankedLeaderboard:
+    # Kept sorted by (-total_points, username, student_id) so the position of the
+    # first entry with a given score is its competition rank. The index is per
+    # process; with a shared cache backend every change is broadcast and the
+    # other workers reload on their next read.
+    CHANNEL = "leaderboard"
+
+    def __init__(self, reconcile_seconds: int = 300):
+        self.reconcile_seconds = reconcile_seconds
+        self.backend = None
+        self._listeners: list[Callable[[], None]] = []
+        self._lock = threading.RLock()
+        self._keys: list[tuple[int, str, int]] = []
+        self._entries: dict[int, tuple[int, str, int]] = {}
+        self._loaded_at: Optional[float] = None
+
+    def init_app(self, app, backend=None) -> None:
+        self.reconcile_seconds = app.config.get(
+            "LEADERBOARD_RECONCILE_SECONDS", self.reconcile_seconds
+        )
+        if backend is not None:
+            self.backend = backend
+            backend.subscribe(self.CHANNEL, lambda _message: self._changed_elsewhere())
+        app.extensions["ranked_leaderboard"] = self
+
+    def on_change(self, callback: Callable[[], None]) -> None:
+        # Called after every change to the standings, here or (with a shared
+        # backend) in another worker, so results built from them can be dropped.
+        self._listeners.append(callback)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def is_stale(self) -> bool:
+        if self._loaded_at is None:
+            return True
+        return time.monotonic() - self._loaded_at >= self.reconcile_seconds
+
+    def load(self, rows: Iterable[dict]) -> None:
+        keys = sorted(
+            (-int(row["total_points"]), row["username"], row["id"]) for row in rows
+        )
+        with self._lock:
+            self._keys = keys
+            self._entries = {key[2]: key for key in keys}
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        self._mark_stale()
+        self._broadcast()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def upsert(self, student_id: int, username: str, total_points: int = 0) -> None:
+        self._upsert(student_id, username, total_points)
+        self._broadcast()
+
+    def adjust(self, student_id: int, delta: int) -> None:
+        if delta == 0:
+            return
+        with self._lock:
+            key = self._entries.get(student_id)
+            if key is not None:
+                self._upsert(student_id, key[1], -key[0] + delta)
+        self._broadcast()
+
+    def rename(self, student_id: int, username: str) -> None:
+        with self._lock:
+            key = self._entries.get(student_id)
+            if key is not None:
+                self._upsert(student_id, username, -key[0])
+        self._broadcast()
+
+    def remove(self, student_id: int) -> None:
+        with self._lock:
+            self._remove(student_id)
+        self._broadcast()
+
+    def rank_of_points(self, total_points: int) -> int:
+        with self._lock:
+            return bisect_left(self._keys, (-int(total_points),)) + 1
+
+    def position(self, student_id: int) -> Optional[dict]:
+        with self._lock:
+            key = self._entries.get(student_id)
+            if key is None:
+                return None
+            return {
+                "index": bisect_left(self._keys, key),
+                "username": key[1],
+                "total_points": -key[0],
+                "rank": bisect_left(self._keys, (key[0],)) + 1,
+            }
+
+    def index_after(self, total_points: int, username: str) -> int:
+        with self._lock:
+            return bisect_right(self._keys, (-int(total_points), username, float("inf")))
+
+    def rows(self, offset: int = 0, limit: Optional[int] = None) -> list[dict]:
+        with self._lock:
+            offset = max(offset, 0)
+            end = len(self._keys) if limit is None else offset + limit
+            window = self._keys[offset:end]
+            rank = None
+            last_points = None
+            result = []
+            for index, key in enumerate(window, start=offset):
+                if rank is None:
+                    rank = bisect_left(self._keys, (key[0],)) + 1
+                elif key[0] != last_points:
+                    rank = index + 1
+                last_points = key[0]
+                result.append(
+                    {
+                        "id": key[2],
+                        "username": key[1],
+                        "total_points": -key[0],
+                        "rank": rank,
+                    }
+                )
+            return result
+
+    def top(self, count: int) -> list[dict]:
+        return self.rows(0, count)
+
+    def _upsert(self, student_id: int, username: str, total_points: int) -> None:
+        with self._lock:
+            if not self.loaded:
+                return
+            self._remove(student_id)
+            key = (-int(total_points), username, student_id)
+            insort(self._keys, key)
+            self._entries[student_id] = key
+
+    def _mark_stale(self) -> None:
+        with self._lock:
+            self._loaded_at = None
+
+    def _broadcast(self) -> None:
+        # Sent even when this worker has nothing loaded: the database changed.
+        self._notify()
+        if self.backend is not None:
+            self.backend.broadcast(self.CHANNEL, None)
+
+    def _changed_elsewhere(self) -> None:
+        self._mark_stale()
+        self._notify()
+
+    def _notify(self) -> None:
+        for callback in self._listeners:
+            callback()
+
+    def _remove(self, student_id: int) -> None:
+        key = self._entries.pop(student_id, None)
+        if key is None:
+            return
+        index = bisect_left(self._keys, key)
+        if index < len(self._keys) and self._keys[index] == key:
+            del self._keys[index]
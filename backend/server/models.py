@@ -86,6 +86,8 @@ class Reward:
     created_by: int
     description: Optional[str] = None
     cost: int = 0
+    stock: Optional[int] = None
+    per_student_limit: Optional[int] = None
     active: bool = True
     created_at: datetime = field(default_factory=datetime.now)
     updated_at: Optional[datetime] = None
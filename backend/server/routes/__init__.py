@@ -2,5 +2,22 @@ from .auth import auth_bp
 from .tasks import tasks_bp
 from .students import students_bp
 from .shop import shop_bp
+from .notifications import notifications_bp
+from .dashboard import dashboard_bp
+from .batch import batch_bp
+from .events import events_bp
+from .sync import sync_bp
+from .metrics import metrics_bp
 
-__all__ = ["auth_bp", "tasks_bp", "students_bp", "shop_bp"]
+__all__ = [
+    "auth_bp",
+    "tasks_bp",
+    "students_bp",
+    "shop_bp",
+    "notifications_bp",
+    "dashboard_bp",
+    "batch_bp",
+    "events_bp",
+    "sync_bp",
+    "metrics_bp",
+]
@@ -8,7 +8,7 @@ import jwt
 from flask import Blueprint, current_app, jsonify, make_response, request
 
 from ..db import get_db
-from ..extensions import bcrypt
+from ..extensions import bcrypt, query_cache, ranked_leaderboard
 from ..services import ServiceError, UserService
 from ..utils.auth import get_current_user, require_user
 
@@ -29,7 +29,7 @@ def _generate_access_token(user_id: int, role: str):
 
 
 def _get_user_service() -> UserService:
-    return UserService(bcrypt)
+    return UserService(bcrypt, board=ranked_leaderboard, query_cache=query_cache)
 
 
 def _hash_refresh_token(token: str) -> str:
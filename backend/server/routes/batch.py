@@ -0,0 +1,68 @@
+import time
+
+from flask import Blueprint, current_app, jsonify, request
+
+from ..db import share_request_db
+from ..utils.auth import require_user
+
+batch_bp = Blueprint("batch", __name__)
+
+# Endpoints whose body never ends; they are turned away before dispatching.
+STREAMING_PATHS = ("/events",)
+
+
+def _error(message, status):
+    return {"status": status, "body": {"success": False, "message": message}}
+
+
+def _dispatch(path):
+    # The sub-request runs inside the batch's app context, so it sees the same
+    # g: the shared connection and the already loaded current user.
+    headers = {}
+    if request.headers.get("Cookie"):
+        headers["Cookie"] = request.headers["Cookie"]
+    with current_app.test_request_context(path, method="GET", headers=headers):
+        response = current_app.full_dispatch_request()
+        if not response.is_json:
+            # Close what is dropped so a streamed body still runs its cleanup.
+            response.close()
+            if response.status_code >= 400:
+                return _error(response.status, response.status_code)
+            return _error("Only JSON endpoints can be batched.", 400)
+        return {"status": response.status_code, "body": response.get_json()}
+
+
+@batch_bp.route("/batch", methods=["POST"])
+def batch():
+    share_request_db()
+    _user, error = require_user()
+    if error:
+        return jsonify(error[0]), error[1]
+
+    data = request.get_json(silent=True) or {}
+    items = data.get("requests")
+    if not isinstance(items, list) or not items:
+        return jsonify({"success": False, "message": "requests must be a non-empty list."}), 400
+    max_requests = current_app.config["BATCH_MAX_REQUESTS"]
+    if len(items) > max_requests:
+        return jsonify(
+            {"success": False, "message": f"A batch can hold at most {max_requests} requests."}
+        ), 400
+
+    # Sub-requests run one by one; once the budget is spent the rest are
+    # answered with 503 instead of being started.
+    deadline = time.monotonic() + current_app.config["BATCH_TIME_BUDGET_SECONDS"]
+    responses = []
+    for item in items:
+        path = item.get("path") if isinstance(item, dict) else None
+        if not isinstance(path, str) or not path.startswith("/"):
+            responses.append(_error("Each request needs a path starting with /.", 400))
+        elif path.split("?", 1)[0].rstrip("/") == "/batch":
+            responses.append(_error("Batches cannot be nested.", 400))
+        elif path.split("?", 1)[0].rstrip("/") in STREAMING_PATHS:
+            responses.append(_error("Streaming endpoints cannot be batched.", 400))
+        elif time.monotonic() >= deadline:
+            responses.append(_error("Batch time budget exceeded.", 503))
+        else:
+            responses.append(_dispatch(path))
+    return jsonify({"responses": responses}), 200
@@ -0,0 +1,137 @@
+import json
+
+from flask import Blueprint, jsonify, request
+
+from ..db import share_request_db
+from ..extensions import unread_notifications
+from ..services import NotificationService, ServiceError
+from ..utils.auth import require_role
+from .shop import _get_shop_service
+from .students import _get_student_service, _get_submission_service
+from .tasks import _get_task_service
+
+dashboard_bp = Blueprint("dashboard", __name__)
+
+OVERVIEW_PAGE_SIZE = 50
+PURCHASES_PAGE_SIZE = 50
+
+# Sections that need a taskId and are only built when asked for.
+ON_REQUEST_SECTIONS = ("submissions",)
+
+
+def _me(user):
+    return {
+        "success": True,
+        "userId": user["id"],
+        "username": user["username"],
+        "email": user.get("email"),
+        "role": user["role"],
+        "points": user["points"],
+    }
+
+
+def _rewards(_user):
+    _, payload = _get_shop_service().reward_catalog()
+    return json.loads(payload)
+
+
+def _student_submissions(user):
+    task_id = request.args.get("taskId")
+    return {"submissions": _get_submission_service().list_my_submissions(user, task_id)}
+
+
+def _student_progress(user):
+    progress = _get_student_service().student_progress(user)
+    return {"success": True, "tasks": progress["tasks"], "points": progress["points"]}
+
+
+def _tutor_submissions(_user):
+    task_id = request.args.get("taskId", type=int)
+    if task_id is None:
+        raise ServiceError("taskId is required for submissions.")
+    submissions = _get_submission_service().list_task_submissions(task_id)
+    return {"success": True, "submissions": submissions}
+
+
+def _overview(user):
+    # First page only; the overview streams on its own unbuffered connection.
+    service = _get_student_service()
+    students = service.students_overview(user["id"], limit=OVERVIEW_PAGE_SIZE + 1)
+    try:
+        page = []
+        next_cursor = None
+        for student in students:
+            if len(page) == OVERVIEW_PAGE_SIZE:
+                next_cursor = service.overview_cursor(page[-1])
+                break
+            page.append(student)
+    finally:
+        students.close()
+    return {"students": page, "nextCursor": next_cursor}
+
+
+# Each section returns the same body as the standalone endpoint it replaces.
+STUDENT_BUILDERS = {
+    "me": _me,
+    "tasks": lambda user: {"tasks": _get_task_service().list_tasks(user)},
+    "leaderboard": lambda _user: {"leaderboard": _get_student_service().leaderboard()},
+    "rewards": _rewards,
+    "purchases": lambda user: _get_shop_service().list_purchases(user["id"]),
+    "progress": _student_progress,
+    "notifications": lambda user: {
+        "unread": NotificationService(unread_notifications).unread_count(user["id"])
+    },
+    "submissions": _student_submissions,
+}
+
+TUTOR_BUILDERS = {
+    "me": _me,
+    "tasks": lambda user: {"tasks": _get_task_service().list_tasks(user)},
+    "rewards": _rewards,
+    # First page only, like /purchases/all?limit=; nextCursor pages on from there.
+    "purchases": lambda _user: _get_shop_service().list_all_purchases(PURCHASES_PAGE_SIZE),
+    "students": lambda _user: {"students": _get_student_service().list_students()},
+    "overview": _overview,
+    "submissions": _tutor_submissions,
+}
+
+
+def _build(user, builders):
+    requested = request.args.get("include")
+    if requested:
+        names = [name.strip() for name in requested.split(",") if name.strip()]
+    else:
+        names = [name for name in builders if name not in ON_REQUEST_SECTIONS]
+    unknown = [name for name in names if name not in builders]
+    if unknown:
+        return jsonify(
+            {"success": False, "message": f"Unknown section(s): {', '.join(unknown)}."}
+        ), 400
+
+    # Sections run one after another on the request's single connection; a
+    # failing section reports its error without failing the others.
+    body = {}
+    for name in dict.fromkeys(names):
+        try:
+            body[name] = builders[name](user)
+        except ServiceError as exc:
+            body[name] = {"success": False, "message": exc.message, "status": exc.status}
+    return jsonify(body), 200
+
+
+@dashboard_bp.route("/dashboard/student", methods=["GET"])
+def student_dashboard():
+    share_request_db()
+    student, error = require_role("student")
+    if error:
+        return jsonify(error[0]), error[1]
+    return _build(student, STUDENT_BUILDERS)
+
+
+@dashboard_bp.route("/dashboard/tutor", methods=["GET"])
+def tutor_dashboard():
+    share_request_db()
+    teacher, error = require_role("tutor")
+    if error:
+        return jsonify(error[0]), error[1]
+    return _build(teacher, TUTOR_BUILDERS)
@@ -0,0 +1,37 @@
+from flask import Blueprint, Response, current_app, jsonify
+
+from ..extensions import event_bus
+from ..utils.auth import require_user
+
+events_bp = Blueprint("events", __name__)
+
+
+@events_bp.route("/events", methods=["GET"])
+def stream_events():
+    user, error = require_user()
+    if error:
+        return jsonify(error[0]), error[1]
+
+    # The stream holds no database connection; it only waits on its queue.
+    # Each open stream parks a worker, so this is meant for gevent workers.
+    # The subscription is taken once the body starts, so a response that is
+    # never sent cannot leave one behind.
+    heartbeat_seconds = current_app.config["EVENTS_HEARTBEAT_SECONDS"]
+
+    def generate():
+        subscription = event_bus.subscribe(user)
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                message = subscription.get(timeout=heartbeat_seconds)
+                # Comments keep proxies from closing an idle stream and let a
+                # closed client surface as a failed write.
+                yield message if message is not None else ": keep-alive\n\n"
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,18 @@
+from flask import Blueprint, jsonify
+
+from ..extensions import query_cache, shared_reads
+from ..utils.auth import require_role
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+# Counters are per worker process.
+@metrics_bp.route("/metrics", methods=["GET"])
+def metrics():
+    teacher, error = require_role("tutor")
+    if error:
+        return jsonify(error[0]), error[1]
+    return (
+        jsonify({"singleFlight": shared_reads.metrics(), "queryCache": query_cache.stats()}),
+        200,
+    )
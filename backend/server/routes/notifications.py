@@ -0,0 +1,54 @@
+from flask import Blueprint, jsonify, request
+
+from ..extensions import unread_notifications
+from ..services import NotificationService, ServiceError
+from ..utils.auth import require_user
+
+notifications_bp = Blueprint("notifications", __name__)
+
+
+def _get_notification_service() -> NotificationService:
+    return NotificationService(unread_notifications)
+
+
+@notifications_bp.route("/notifications", methods=["GET"])
+def list_notifications():
+    user, error = require_user()
+    if error:
+        return jsonify(error[0]), error[1]
+
+    limit = min(max(request.args.get("limit", 20, type=int), 1), 100)
+    before = request.args.get("before", type=int)
+
+    service = _get_notification_service()
+    return jsonify(service.inbox(user["id"], limit, before)), 200
+
+
+@notifications_bp.route("/notifications/unread-count", methods=["GET"])
+def unread_count():
+    user, error = require_user()
+    if error:
+        return jsonify(error[0]), error[1]
+
+    service = _get_notification_service()
+    return jsonify({"unread": service.unread_count(user["id"])}), 200
+
+
+@notifications_bp.route("/notifications/seen", methods=["POST"])
+def mark_seen():
+    user, error = require_user()
+    if error:
+        return jsonify(error[0]), error[1]
+
+    data = request.get_json(silent=True) or {}
+    last_seen_id = data.get("lastSeenId")
+    if last_seen_id is not None and not isinstance(last_seen_id, int):
+        return jsonify({"success": False, "message": "lastSeenId must be a number."}), 400
+
+    service = _get_notification_service()
+    try:
+        last_seen_id = service.mark_seen(user["id"], last_seen_id)
+    except ServiceError as exc:
+        return jsonify({"success": False, "message": exc.message}), exc.status
+
+    return jsonify({"success": True, "lastSeenId": last_seen_id}), 200
@@ -1,21 +1,75 @@
-from flask import Blueprint, jsonify, request
+from typing import Optional
 
-from ..services import ServiceError, ShopService, TimeProvider
-from ..utils.auth import require_role, require_user
+from flask import Blueprint, Response, jsonify, request
+
+from ..extensions import (
+    event_bus,
+    query_cache,
+    reward_catalog,
+    shared_reads,
+    sold_out_rewards,
+)
+from ..services import ServiceError, ShopService, ShopStatsService, TimeProvider
+from ..utils.auth import require_role
+from ..utils.conditional import changed, conditional
 
 shop_bp = Blueprint("shop", __name__)
 
 
 def _get_shop_service() -> ShopService:
-    return ShopService(clock=TimeProvider())
+    return ShopService(
+        clock=TimeProvider(),
+        sold_out=sold_out_rewards,
+        catalog=reward_catalog,
+        events=event_bus,
+        flights=shared_reads,
+        query_cache=query_cache,
+    )
+
+
+def _get_shop_stats_service() -> ShopStatsService:
+    return ShopStatsService(clock=TimeProvider())
+
+
+def _reward_limits(data: dict) -> dict:
+    return {key: data[key] for key in ("stock", "perStudentLimit") if key in data}
+
+
+def _ledger_limit() -> Optional[int]:
+    # Without limit or cursor the whole history comes back, as before paging.
+    limit = request.args.get("limit", type=int)
+    if limit is None and not request.args.get("cursor"):
+        return None
+    return min(max(limit or 50, 1), 200)
+
+
+def _ledger_filters() -> dict:
+    return {
+        "rewardId": request.args.get("rewardId", type=int),
+        "from": request.args.get("from"),
+        "to": request.args.get("to"),
+    }
 
 
 @shop_bp.route("/rewards", methods=["GET"])
 def list_rewards():
-    user, _ = require_user()
+    # The catalog is the same for everyone, so it is served from memory
+    # without an auth lookup.
     service = _get_shop_service()
-    rewards = service.list_rewards(user)
-    return jsonify({"rewards": rewards}), 200
+    etag, payload = service.reward_catalog()
+    response = Response(payload, status=200, mimetype="application/json")
+    if etag:
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@shop_bp.route("/rewards/stock", methods=["GET"])
+def reward_stock():
+    # Purchases do not rebuild the catalog until a reward sells out, so
+    # clients that show how many are left read them here.
+    service = _get_shop_service()
+    return jsonify({"stock": service.reward_stock()}), 200
 
 
 @shop_bp.route("/rewards", methods=["POST"])
@@ -31,7 +85,7 @@ def create_reward():
 
     service = _get_shop_service()
     try:
-        service.create_reward(teacher, title, description, cost)
+        service.create_reward(teacher, title, description, cost, _reward_limits(data))
     except ServiceError as exc:
         return jsonify({"success": False, "message": exc.message}), exc.status
 
@@ -58,7 +112,7 @@ def update_reward(reward_id: int):
     cost = data.get("cost")
 
     try:
-        service.update_reward(reward_id, title, description, cost)
+        service.update_reward(reward_id, title, description, cost, _reward_limits(data))
     except ServiceError as exc:
         return jsonify({"success": False, "message": exc.message}), exc.status
 
@@ -81,22 +135,55 @@ def purchase_reward(reward_id: int):
 
 
 @shop_bp.route("/purchases/all", methods=["GET"])
+@conditional(changed("purchase"), role="tutor")
 def list_all_purchases():
     teacher, error = require_role("tutor")
     if error:
         return jsonify(error[0]), error[1]
 
+    filters = _ledger_filters()
+    filters["studentId"] = request.args.get("studentId", type=int)
+
     service = _get_shop_service()
-    purchases = service.list_all_purchases()
-    return jsonify({"purchases": purchases}), 200
+    try:
+        page = service.list_all_purchases(
+            _ledger_limit(), request.args.get("cursor"), filters
+        )
+    except ServiceError as exc:
+        return jsonify({"success": False, "message": exc.message}), exc.status
+    return jsonify(page), 200
 
 
 @shop_bp.route("/purchases", methods=["GET"])
+@conditional(changed("purchase"), role="student")
 def list_purchases():
     student, error = require_role("student")
     if error:
         return jsonify(error[0]), error[1]
 
     service = _get_shop_service()
-    purchases = service.list_purchases(student["id"])
-    return jsonify({"purchases": purchases}), 200
+    try:
+        page = service.list_purchases(
+            student["id"], _ledger_limit(), request.args.get("cursor"), _ledger_filters()
+        )
+    except ServiceError as exc:
+        return jsonify({"success": False, "message": exc.message}), exc.status
+    return jsonify(page), 200
+
+
+@shop_bp.route("/shop/stats", methods=["GET"])
+def shop_stats():
+    teacher, error = require_role("tutor")
+    if error:
+        return jsonify(error[0]), error[1]
+
+    days = min(max(request.args.get("days", 90, type=int), 1), 366)
+    bucket = request.args.get("bucket", "week")
+    top = min(max(request.args.get("top", 5, type=int), 1), 50)
+
+    service = _get_shop_stats_service()
+    try:
+        stats = service.stats(days, bucket, top)
+    except ServiceError as exc:
+        return jsonify({"success": False, "message": exc.message}), exc.status
+    return jsonify(stats), 200
@@ -1,12 +1,30 @@
-from flask import Blueprint, current_app, jsonify, request, send_file
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    jsonify,
+    request,
+    send_file,
+    stream_with_context,
+)
 
+from ..extensions import (
+    event_bus,
+    progress_cache,
+    query_cache,
+    ranked_leaderboard,
+    shared_reads,
+    unread_notifications,
+)
 from ..services import (
+    NotificationService,
     ServiceError,
     StudentService,
     SubmissionService,
     TimeProvider,
 )
 from ..utils.auth import require_role, require_user
+from ..utils.conditional import changed, conditional
 
 students_bp = Blueprint("students", __name__)
 
@@ -15,11 +33,23 @@ def _get_submission_service() -> SubmissionService:
     return SubmissionService(
         current_app.config["UPLOAD_FOLDER"],
         clock=TimeProvider(current_app.config.get("KST_OFFSET_HOURS", 9)),
+        board=ranked_leaderboard,
+        progress_cache=progress_cache,
+        notifications=NotificationService(unread_notifications),
+        events=event_bus,
+        query_cache=query_cache,
     )
 
 
 def _get_student_service() -> StudentService:
-    return StudentService()
+    board = ranked_leaderboard if current_app.config["LEADERBOARD_IN_MEMORY"] else None
+    return StudentService(
+        board=board,
+        clock=TimeProvider(current_app.config.get("KST_OFFSET_HOURS", 9)),
+        progress_cache=progress_cache,
+        flights=shared_reads,
+        query_cache=query_cache,
+    )
 
 
 @students_bp.route("/submissions", methods=["POST"])
@@ -53,6 +83,7 @@ def create_submission():
 
 
 @students_bp.route("/submissions", methods=["GET"])
+@conditional(changed("task", "submission"), role="student")
 def list_my_submissions():
     student, error = require_role("student")
     if error:
@@ -70,6 +101,7 @@ def list_my_submissions():
 
 
 @students_bp.route("/tasks/<int:task_id>/submissions", methods=["GET"])
+@conditional(changed("task", "submission"), role="tutor")
 def list_task_submissions(task_id: int):
     teacher, error = require_role("tutor")
     if error:
@@ -157,8 +189,44 @@ def delete_submission(submission_id: int):
 @students_bp.route("/leaderboard", methods=["GET"])
 def leaderboard():
     service = _get_student_service()
-    leaderboard_rows = service.leaderboard()
-    return jsonify({"leaderboard": leaderboard_rows}), 200
+    window = request.args.get("window", "all")
+    limit = request.args.get("limit", type=int)
+    cursor = request.args.get("cursor")
+
+    if window != "all":
+        try:
+            leaderboard_rows = service.leaderboard_window(window)
+        except ServiceError as exc:
+            return jsonify({"success": False, "message": exc.message}), exc.status
+        return jsonify({"leaderboard": leaderboard_rows, "window": window}), 200
+
+    if limit is None and not cursor:
+        leaderboard_rows = service.leaderboard()
+        return jsonify({"leaderboard": leaderboard_rows}), 200
+
+    limit = min(max(limit or 20, 1), 100)
+    try:
+        page = service.leaderboard_page(limit, cursor)
+    except ServiceError as exc:
+        return jsonify({"success": False, "message": exc.message}), exc.status
+
+    return jsonify(page), 200
+
+
+@students_bp.route("/leaderboard/me", methods=["GET"])
+def leaderboard_me():
+    student, error = require_role("student")
+    if error:
+        return jsonify(error[0]), error[1]
+
+    neighbors = min(max(request.args.get("neighbors", 2, type=int), 0), 10)
+
+    service = _get_student_service()
+    position = service.leaderboard_position(student["id"], neighbors)
+    if position is None:
+        return jsonify({"success": False, "message": "Student not ranked."}), 404
+
+    return jsonify({"success": True, **position}), 200
 
 
 @students_bp.route("/student-progress", methods=["GET"])
@@ -189,6 +257,49 @@ def students_overview():
     if error:
         return jsonify(error[0]), error[1]
 
+    limit = request.args.get("limit", type=int)
+    if limit is not None:
+        limit = min(max(limit, 1), 500)
+    cursor = request.args.get("cursor")
+    overdue_only = request.args.get("overdue", "").lower() in ("1", "true")
+
     service = _get_student_service()
-    overview = service.students_overview(teacher["id"])
-    return jsonify({"students": overview}), 200
+    try:
+        students = service.students_overview(
+            teacher["id"],
+            limit=limit + 1 if limit is not None else None,
+            cursor=cursor,
+            overdue_only=overdue_only,
+        )
+    except ServiceError as exc:
+        return jsonify({"success": False, "message": exc.message}), exc.status
+
+    # Without a limit, students are written out as the unbuffered cursor
+    # produces them, so only one student's rows are held at a time. A page may
+    # come from a read shared with other tutors. One extra student is fetched
+    # to tell whether there is a next page. The status is already sent when
+    # a read fails mid-stream, so the body is closed off with success false
+    # and a message instead, and the students before it are incomplete.
+    def generate():
+        yield '{"students": ['
+        last_student = None
+        next_cursor = None
+        failed = False
+        try:
+            for index, student in enumerate(students):
+                if limit is not None and index == limit:
+                    next_cursor = service.overview_cursor(last_student)
+                    break
+                yield ("," if index else "") + current_app.json.dumps(student)
+                last_student = student
+        except Exception as exc:
+            print("Student overview stream failed:", type(exc).__name__, exc)
+            failed = True
+        finally:
+            students.close()
+        if failed:
+            yield '], "success": false, "message": "Failed to load student overview."}'
+            return
+        yield '], "nextCursor": ' + current_app.json.dumps(next_cursor) + "}"
+
+    return Response(stream_with_context(generate()), status=200, mimetype="application/json")
@@ -0,0 +1,33 @@
+from flask import Blueprint, current_app, jsonify, request
+
+from ..services import ChangeLogService, ServiceError, SyncService, TimeProvider
+from ..utils.auth import require_user
+from .shop import _get_shop_service
+from .students import _get_submission_service
+from .tasks import _get_task_service
+
+sync_bp = Blueprint("sync", __name__)
+
+
+def _get_sync_service() -> SyncService:
+    changes = ChangeLogService(TimeProvider(current_app.config.get("KST_OFFSET_HOURS", 9)))
+    return SyncService(
+        _get_task_service(),
+        _get_submission_service(),
+        _get_shop_service(),
+        changes=changes,
+    )
+
+
+@sync_bp.route("/sync", methods=["GET"])
+def sync():
+    user, error = require_user()
+    if error:
+        return jsonify(error[0]), error[1]
+
+    limit = min(max(request.args.get("limit", 500, type=int), 1), 1000)
+    try:
+        body = _get_sync_service().sync(user, request.args.get("since"), limit)
+    except ServiceError as exc:
+        return jsonify({"success": False, "message": exc.message}), exc.status
+    return jsonify(body), 200
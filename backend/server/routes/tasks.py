@@ -1,7 +1,9 @@
 from flask import Blueprint, current_app, jsonify, request, send_file
 
+from ..extensions import event_bus, progress_cache, query_cache, ranked_leaderboard
 from ..services import ServiceError, TaskService, TimeProvider
 from ..utils.auth import require_role, require_user
+from ..utils.conditional import changed, conditional
 
 tasks_bp = Blueprint("tasks", __name__)
 
@@ -10,10 +12,15 @@ def _get_task_service() -> TaskService:
     return TaskService(
         current_app.config["UPLOAD_FOLDER"],
         clock=TimeProvider(current_app.config.get("KST_OFFSET_HOURS", 9)),
+        board=ranked_leaderboard,
+        progress_cache=progress_cache,
+        events=event_bus,
+        query_cache=query_cache,
     )
 
 
 @tasks_bp.route("/tasks", methods=["GET"])
+@conditional(changed("task", "assignment", "submission"))
 def get_tasks():
     user, error = require_user()
     if error:
@@ -76,6 +83,7 @@ def update_task(task_id: int):
 
 
 @tasks_bp.route("/tasks/<int:task_id>/assignments", methods=["GET"])
+@conditional(changed("task", "assignment"), role="tutor")
 def get_task_assignments(task_id: int):
     teacher, error = require_role("tutor")
     if error:
@@ -1,18 +1,39 @@
-from .core import DateTimeParser, LatePenaltyPolicy, ServiceError, TimeProvider
+from .change_log_service import ChangeLogService
+from .core import (
+    DateTimeParser,
+    KeysetCursor,
+    LatePenaltyPolicy,
+    ServiceError,
+    TimeProvider,
+)
+from .notification_service import NotificationService
+from .outbox_service import OutboxService
+from .reminder_service import ReminderService
+from .score_service import ScoreService
 from .shop_service import ShopService
+from .shop_stats_service import ShopStatsService
 from .student_service import StudentService
 from .submission_service import SubmissionService
+from .sync_service import SyncService
 from .task_service import TaskService
 from .user_service import UserService
 
 __all__ = [
+    "ChangeLogService",
     "DateTimeParser",
+    "KeysetCursor",
     "LatePenaltyPolicy",
     "ServiceError",
     "TimeProvider",
+    "NotificationService",
+    "OutboxService",
+    "ReminderService",
+    "ScoreService",
     "ShopService",
+    "ShopStatsService",
     "StudentService",
     "SubmissionService",
+    "SyncService",
     "TaskService",
     "UserService",
 ]
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+from ..db import get_db
+from .core import KeysetCursor, ServiceError, TimeProvider
+
+
+# Append-only record of writes for /sync. Write paths add rows on their own
+# cursor so a change is logged exactly when it commits. Rows carry ids only;
+# sync reads the current state of whatever changed.
+#
+# seq is the AUTO_INCREMENT id, so writers never wait on each other for it,
+# but seqs can commit out of order and rolled back writes leave holes. Readers
+# only go up to the horizon: the seq below the first hole that is younger than
+# gap_seconds, i.e. a write that may still be committing. Older holes were
+# rolled back. record() should be the last statement before commit, which
+# keeps the time between taking a seq and committing it short.
+#
+#   task        entity_id = task id, everyone
+#   assignment  entity_id = task id, audience_id = the student (un)assigned
+#   submission  entity_id = task id, audience_id = the student; the whole
+#               (task, student) group is resent since attempt numbers shift
+#   reward      entity_id = reward id, everyone
+#   purchase    entity_id = purchase id, audience_id = the buyer; only used
+#               to version the purchase lists, sync does not send purchases
+class ChangeLogService:
+    # Newest rows looked at when searching for holes.
+    HORIZON_WINDOW = 500
+
+    def __init__(self, clock: Optional[TimeProvider] = None, gap_seconds: int = 5):
+        self.clock = clock or TimeProvider()
+        self.gap_seconds = gap_seconds
+        self.cursors = KeysetCursor()
+
+    def record(
+        self,
+        cursor,
+        entity: str,
+        entity_ids: Iterable[int],
+        op: str = "upsert",
+        audience_id: Optional[int] = None,
+    ) -> None:
+        now = self.clock.now_str()
+        entity_ids = list(entity_ids)
+        if not entity_ids:
+            return
+        cursor.executemany(
+            """
+            INSERT INTO change_log (entity, entity_id, op, audience_id, changed_at)
+            VALUES (%s, %s, %s, %s, %s)
+            """,
+            [(entity, entity_id, op, audience_id, now) for entity_id in entity_ids],
+        )
+
+    def record_rows(
+        self, cursor, entity: str, rows: Iterable[tuple[int, int]], op: str = "upsert"
+    ) -> None:
+        # rows: (entity_id, audience_id) pairs, recorded in one go per audience.
+        by_audience: dict = {}
+        for entity_id, audience_id in rows:
+            by_audience.setdefault(audience_id, []).append(entity_id)
+        for audience_id, entity_ids in by_audience.items():
+            self.record(cursor, entity, entity_ids, op=op, audience_id=audience_id)
+
+    def encode(self, seq: int) -> str:
+        return self.cursors.encode(seq)
+
+    def decode(self, cursor: str) -> int:
+        (seq,) = self.cursors.decode(cursor, 1)
+        if not isinstance(seq, int) or seq < 0:
+            raise ServiceError("Invalid cursor.")
+        return seq
+
+    def horizon(self, cursor) -> int:
+        # Highest seq below which every write has committed or rolled back.
+        # Holes are searched among the newest rows only; a write still
+        # committing is always among them.
+        cursor.execute(
+            "SELECT seq, changed_at FROM change_log ORDER BY seq DESC LIMIT %s",
+            (self.HORIZON_WINDOW,),
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            return 0
+        settled_before = self.clock.now() - timedelta(seconds=self.gap_seconds)
+        horizon = rows[-1]["seq"]
+        for row in reversed(rows[:-1]):
+            if row["seq"] != horizon + 1 and row["changed_at"] >= settled_before:
+                break
+            horizon = row["seq"]
+        return horizon
+
+    def head(self) -> int:
+        # Starting point for a client about to do a full load.
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            return self.horizon(cursor)
+        finally:
+            cursor.close()
+            conn.close()
+
+    def version(self, *entities: str) -> tuple[int, Optional[datetime]]:
+        # (seq, UTC time) of the newest change to any of entities up to the
+        # horizon: a cheap validator for responses built only from those
+        # entities. A change committing late lies above the horizon until it
+        # lands, and then raises the version.
+        latest = " UNION ALL ".join(
+            ["SELECT MAX(seq) AS seq FROM change_log WHERE entity = %s AND seq <= %s"]
+            * len(entities)
+        )
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            horizon = self.horizon(cursor)
+            cursor.execute(
+                f"""
+                SELECT c.seq, c.changed_at
+                FROM change_log c
+                JOIN ({latest}) latest ON latest.seq = c.seq
+                ORDER BY c.seq DESC
+                LIMIT 1
+                """,
+                [value for entity in entities for value in (entity, horizon)],
+            )
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+            conn.close()
+
+        if row is None:
+            return 0, None
+        changed_at = row["changed_at"] - timedelta(hours=self.clock.offset_hours)
+        return row["seq"], changed_at.replace(tzinfo=timezone.utc)
+
+    def read(self, user: dict, since: int, limit: int) -> tuple[list[dict], int, bool]:
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT MIN(seq) AS first_seq FROM change_log")
+            first_seq = cursor.fetchone()["first_seq"]
+            if first_seq is not None and since < first_seq - 1:
+                raise ServiceError("Sync cursor expired; reload everything.", status=410)
+
+            horizon = self.horizon(cursor)
+            cursor.execute(
+                """
+                SELECT seq, entity, entity_id, op, audience_id, changed_at
+                FROM change_log
+                WHERE seq > %s AND seq <= %s
+                ORDER BY seq
+                LIMIT %s
+                """,
+                (since, horizon, limit),
+            )
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+        # Short of a full page, everything up to the horizon has been read.
+        last_seq = rows[-1]["seq"] if len(rows) == limit else max(since, horizon)
+        visible = [
+            row
+            for row in rows
+            if user["role"] == "tutor" or row["audience_id"] in (None, user["id"])
+        ]
+        return visible, last_seq, len(rows) == limit
+
+    def prune(self, older_than_days: int) -> int:
+        cutoff = (self.clock.now() - timedelta(days=older_than_days)).strftime(
+            "%Y-%m-%d %H:%M:%S"
+        )
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("DELETE FROM change_log WHERE changed_at < %s", (cutoff,))
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            cursor.close()
+            conn.close()
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import base64
+import json
 import math
 from datetime import datetime, timedelta
 from email.utils import parsedate_to_datetime
@@ -66,6 +68,23 @@ class DateTimeParser:
         return parsed.strftime("%Y-%m-%dT%H:%M:%S")
 
 
+class KeysetCursor:
+    # Opaque page cursors: the sort key of the last row, JSON-encoded and
+    # base64'd so clients treat it as a token.
+    def encode(self, *values) -> str:
+        raw = json.dumps(list(values), default=str).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii")
+
+    def decode(self, cursor: str, size: int) -> list:
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        except ValueError as exc:
+            raise ServiceError("Invalid cursor.") from exc
+        if not isinstance(values, list) or len(values) != size:
+            raise ServiceError("Invalid cursor.")
+        return values
+
+
 class TimeProvider:
     def __init__(self, offset_hours: int = 9):
         self.offset_hours = offset_hours
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+from typing import Iterable, Optional
+
+from ..cache import Cache
+from ..db import get_db
+from .core import DateTimeParser, ServiceError
+
+
+# In-app inbox. notifications is append-only per user; what a user has read is
+# a single last_seen_id in notification_cursors, so marking everything read
+# is one upsert and the unread count is a range count on (user_id, id).
+class NotificationService:
+    def __init__(self, unread_cache: Optional[Cache] = None):
+        self.unread_cache = unread_cache
+        self.parser = DateTimeParser()
+
+    def add(self, cursor, items: Iterable[tuple]) -> list[int]:
+        # items: (user_id, kind, title, body, task_id, dedupe_key). Runs on
+        # the caller's cursor so the notification commits with the event. A
+        # repeated (user_id, dedupe_key) is ignored.
+        items = list(items)
+        if not items:
+            return []
+        cursor.executemany(
+            """
+            INSERT IGNORE INTO notifications (user_id, kind, title, body, task_id, dedupe_key)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            """,
+            items,
+        )
+        return sorted({item[0] for item in items})
+
+    def publish(self, items: Iterable[tuple]) -> int:
+        items = list(items)
+        if not items:
+            return 0
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            user_ids = self.add(cursor, items)
+            conn.commit()
+            added = cursor.rowcount
+        finally:
+            cursor.close()
+            conn.close()
+        self.invalidate(*user_ids)
+        return added
+
+    def inbox(self, user_id: int, limit: int = 20, before: Optional[int] = None) -> dict:
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            query = """
+                SELECT n.id, n.kind, n.title, n.body, n.task_id, n.created_at,
+                       COALESCE(c.last_seen_id, 0) AS last_seen_id
+                FROM notifications n
+                LEFT JOIN notification_cursors c ON c.user_id = n.user_id
+                WHERE n.user_id = %s
+            """
+            params: list = [user_id]
+            if before is not None:
+                query += " AND n.id < %s"
+                params.append(before)
+            query += " ORDER BY n.id DESC LIMIT %s"
+            params.append(limit + 1)
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+        last_seen_id = rows[0]["last_seen_id"] if rows else 0
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1]["id"]
+
+        notifications = [
+            {
+                "id": row["id"],
+                "kind": row["kind"],
+                "title": row["title"],
+                "body": row["body"],
+                "taskId": row["task_id"],
+                "createdAt": self.parser.format_iso(row["created_at"]),
+                "unread": row["id"] > last_seen_id,
+            }
+            for row in rows
+        ]
+        return {
+            "notifications": notifications,
+            "unread": self.unread_count(user_id),
+            "lastSeenId": last_seen_id,
+            "nextCursor": next_cursor,
+        }
+
+    def unread_count(self, user_id: int) -> int:
+        if self.unread_cache is not None:
+            cached = self.unread_cache.get(user_id)
+            if cached is not None:
+                return cached
+
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                """
+                SELECT COUNT(*) AS total
+                FROM notifications n
+                WHERE n.user_id = %s
+                  AND n.id > COALESCE(
+                      (SELECT last_seen_id FROM notification_cursors WHERE user_id = %s), 0
+                  )
+                """,
+                (user_id, user_id),
+            )
+            count = cursor.fetchone()["total"]
+        finally:
+            cursor.close()
+            conn.close()
+
+        if self.unread_cache is not None:
+            self.unread_cache.set(user_id, count)
+        return count
+
+    def mark_seen(self, user_id: int, last_seen_id: Optional[int] = None) -> int:
+        if last_seen_id is not None and last_seen_id < 0:
+            raise ServiceError("lastSeenId must be non-negative.")
+
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            if last_seen_id is None:
+                cursor.execute(
+                    "SELECT COALESCE(MAX(id), 0) AS last_id FROM notifications WHERE user_id = %s",
+                    (user_id,),
+                )
+                last_seen_id = cursor.fetchone()["last_id"]
+            # The cursor only moves forward, so a stale tab cannot mark newer
+            # notifications unread again.
+            cursor.execute(
+                """
+                INSERT INTO notification_cursors (user_id, last_seen_id)
+                VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE last_seen_id = GREATEST(last_seen_id, VALUES(last_seen_id))
+                """,
+                (user_id, last_seen_id),
+            )
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+        self.invalidate(user_id)
+        return last_seen_id
+
+    def invalidate(self, *user_ids: int) -> None:
+        if self.unread_cache is not None:
+            self.unread_cache.delete(*user_ids)
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import uuid
+from datetime import timedelta
+from typing import Iterable, Optional
+
+from ..db import get_db
+from .core import TimeProvider
+
+
+# Reminder emails go through notification_outbox: the scanner enqueues rows
+# and a delivery worker claims them with a lease, sends, and records the
+# outcome. A row is claimable while it is pending, or while it is "sending"
+# but its lease (available_at) has run out because the worker died.
+class OutboxService:
+    def __init__(
+        self,
+        clock: Optional[TimeProvider] = None,
+        max_attempts: int = 5,
+        retry_seconds: int = 60,
+    ):
+        self.clock = clock or TimeProvider()
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+
+    def enqueue(self, jobs: Iterable[tuple]) -> int:
+        # jobs: (task_id, student_id, reminder_type, to_address, subject, body,
+        # digest_id). The unique key on (task_id, student_id, reminder_type)
+        # makes re-enqueueing the same reminder a no-op. Rows sharing a
+        # digest_id are delivered as one email.
+        jobs = list(jobs)
+        if not jobs:
+            return 0
+        now = self.clock.now_str()
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(
+                """
+                INSERT IGNORE INTO notification_outbox (
+                    task_id, student_id, reminder_type, to_address, subject, body,
+                    digest_id, available_at
+                )
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                """,
+                [job + (now,) for job in jobs],
+            )
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            cursor.close()
+            conn.close()
+
+    def claim(self, limit: int, lease_seconds: int) -> tuple[str, list[dict]]:
+        now = self.clock.now()
+        lease_token = uuid.uuid4().hex
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            # SKIP LOCKED lets several workers claim disjoint batches. Rows
+            # for a task the student has submitted since the reminder was
+            # queued are dropped instead of sent.
+            while True:
+                cursor.execute(
+                    """
+                    SELECT o.id, o.digest_id,
+                           EXISTS (
+                               SELECT 1 FROM submissions s
+                               WHERE s.student_id = o.student_id AND s.task_id = o.task_id
+                           ) AS submitted
+                    FROM notification_outbox o
+                    WHERE o.status IN ('pending', 'sending') AND o.available_at <= %s
+                    ORDER BY o.available_at, o.id
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                    """,
+                    (now, limit),
+                )
+                rows = cursor.fetchall()
+                if not rows:
+                    conn.commit()
+                    return lease_token, []
+                stale = [row["id"] for row in rows if row["submitted"]]
+                if stale:
+                    cursor.execute(
+                        f"""
+                        DELETE FROM notification_outbox
+                        WHERE id IN ({", ".join(["%s"] * len(stale))})
+                        """,
+                        stale,
+                    )
+                rows = [row for row in rows if not row["submitted"]]
+                if rows:
+                    break
+            ids = [row["id"] for row in rows if not row["digest_id"]]
+
+            # A digest goes out as one email, so it is claimed as a unit: the
+            # batch takes every due row of the digests it cut through, and
+            # leaves a digest alone if another worker holds any of its rows.
+            digest_ids = sorted({row["digest_id"] for row in rows if row["digest_id"]})
+            if digest_ids:
+                due = f"""
+                    o.digest_id IN ({", ".join(["%s"] * len(digest_ids))})
+                    AND o.status IN ('pending', 'sending') AND o.available_at <= %s
+                    AND NOT EXISTS (
+                        SELECT 1 FROM submissions s
+                        WHERE s.student_id = o.student_id AND s.task_id = o.task_id
+                    )
+                """
+                cursor.execute(
+                    f"""
+                    SELECT o.id, o.digest_id
+                    FROM notification_outbox o
+                    WHERE {due}
+                    FOR UPDATE SKIP LOCKED
+                    """,
+                    [*digest_ids, now],
+                )
+                locked = cursor.fetchall()
+                cursor.execute(
+                    f"""
+                    SELECT o.digest_id, COUNT(*) AS total
+                    FROM notification_outbox o
+                    WHERE {due}
+                    GROUP BY o.digest_id
+                    """,
+                    [*digest_ids, now],
+                )
+                totals = {row["digest_id"]: row["total"] for row in cursor.fetchall()}
+                held = {}
+                for row in locked:
+                    held[row["digest_id"]] = held.get(row["digest_id"], 0) + 1
+                ids.extend(
+                    row["id"]
+                    for row in locked
+                    if held[row["digest_id"]] >= totals.get(row["digest_id"], 0)
+                )
+            if not ids:
+                conn.commit()
+                return lease_token, []
+
+            placeholders = ", ".join(["%s"] * len(ids))
+            cursor.execute(
+                f"""
+                UPDATE notification_outbox
+                SET status = 'sending',
+                    lease_token = %s,
+                    available_at = %s,
+                    attempts = attempts + 1
+                WHERE id IN ({placeholders})
+                """,
+                [lease_token, now + timedelta(seconds=lease_seconds), *ids],
+            )
+            # Task and student details let delivery render a digest again from
+            # the rows that are actually going out.
+            cursor.execute(
+                f"""
+                SELECT o.id, o.task_id, o.student_id, o.reminder_type, o.to_address,
+                       o.subject, o.body, o.digest_id, o.attempts,
+                       t.title, CAST(t.deadline AS CHAR) AS deadline, u.username
+                FROM notification_outbox o
+                JOIN tasks t ON t.id = o.task_id
+                JOIN users u ON u.id = o.student_id
+                WHERE o.id IN ({placeholders})
+                ORDER BY o.id
+                """,
+                ids,
+            )
+            jobs = cursor.fetchall()
+            conn.commit()
+            return lease_token, jobs
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+    def complete(self, lease_token: str, sent: list[dict], failed: list[tuple[dict, str]]) -> None:
+        # Only rows still holding this lease are updated, so a worker whose
+        # lease ran out cannot overwrite the outcome of the one that took over.
+        # The reminder log follows the same rows.
+        now = self.clock.now()
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            logged = []
+            for job in sent:
+                cursor.execute(
+                    """
+                    UPDATE notification_outbox
+                    SET status = 'sent', sent_at = %s, lease_token = NULL, last_error = NULL
+                    WHERE id = %s AND lease_token = %s
+                    """,
+                    (now, job["id"], lease_token),
+                )
+                if cursor.rowcount:
+                    logged.append((job["task_id"], job["student_id"], job["reminder_type"]))
+            if logged:
+                cursor.executemany(
+                    """
+                    INSERT IGNORE INTO reminder_logs (task_id, student_id, reminder_type)
+                    VALUES (%s, %s, %s)
+                    """,
+                    logged,
+                )
+
+            retries = []
+            dead = []
+            for job, error in failed:
+                if job["attempts"] >= self.max_attempts:
+                    dead.append((error[:1000], job["id"], lease_token))
+                else:
+                    delay = self.retry_seconds * 2 ** (job["attempts"] - 1)
+                    retries.append(
+                        (now + timedelta(seconds=delay), error[:1000], job["id"], lease_token)
+                    )
+            if retries:
+                cursor.executemany(
+                    """
+                    UPDATE notification_outbox
+                    SET status = 'pending', available_at = %s, last_error = %s, lease_token = NULL
+                    WHERE id = %s AND lease_token = %s
+                    """,
+                    retries,
+                )
+            if dead:
+                cursor.executemany(
+                    """
+                    UPDATE notification_outbox
+                    SET status = 'dead', last_error = %s, lease_token = NULL
+                    WHERE id = %s AND lease_token = %s
+                    """,
+                    dead,
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+    def counts(self) -> dict:
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "SELECT status, COUNT(*) AS total FROM notification_outbox GROUP BY status"
+            )
+            return {row["status"]: row["total"] for row in cursor.fetchall()}
+        finally:
+            cursor.close()
+            conn.close()
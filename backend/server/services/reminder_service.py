@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+import json
+import uuid
+from datetime import datetime
+from typing import Iterator, Optional
+
+from ..db import get_db
+from .core import TimeProvider
+from .notification_service import NotificationService
+from .outbox_service import OutboxService
+
+
+class ReminderService:
+    # reminder_type -> hours before the deadline
+    REMINDERS = (("24h", 24), ("12h", 12))
+
+    def __init__(
+        self,
+        clock: Optional[TimeProvider] = None,
+        outbox: Optional[OutboxService] = None,
+        notifications: Optional[NotificationService] = None,
+    ):
+        self.clock = clock or TimeProvider()
+        self.outbox = outbox or OutboxService(self.clock)
+        self.notifications = notifications or NotificationService()
+
+    def schedule(self, cursor, task_id: int, deadline) -> None:
+        # Runs on the task write's cursor. A reminder whose fire time moves is
+        # armed again; one whose time is unchanged keeps its fired_at.
+        cursor.executemany(
+            """
+            INSERT INTO reminder_schedule (task_id, reminder_type, fire_at)
+            VALUES (%s, %s, DATE_SUB(%s, INTERVAL %s HOUR))
+            ON DUPLICATE KEY UPDATE
+                fired_at = IF(fire_at = VALUES(fire_at), fired_at, NULL),
+                fire_at = VALUES(fire_at)
+            """,
+            [(task_id, reminder_type, deadline, hours) for reminder_type, hours in self.REMINDERS],
+        )
+
+    def backfill_schedule(self) -> int:
+        # Schedules tasks created before reminder_schedule existed.
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            inserted = 0
+            for reminder_type, hours in self.REMINDERS:
+                cursor.execute(
+                    """
+                    INSERT IGNORE INTO reminder_schedule (task_id, reminder_type, fire_at)
+                    SELECT id, %s, DATE_SUB(deadline, INTERVAL %s HOUR)
+                    FROM tasks
+                    WHERE deadline > %s
+                    """,
+                    (reminder_type, hours, self.clock.now_str()),
+                )
+                inserted += cursor.rowcount
+            conn.commit()
+            return inserted
+        finally:
+            cursor.close()
+            conn.close()
+
+    def pending(self, until: datetime) -> list[dict]:
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                """
+                SELECT rs.task_id, rs.reminder_type, rs.fire_at, t.deadline
+                FROM reminder_schedule rs
+                JOIN tasks t ON t.id = rs.task_id
+                WHERE rs.fired_at IS NULL AND rs.fire_at <= %s
+                ORDER BY rs.fire_at
+                """,
+                (until,),
+            )
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def mark_fired(self, task_id: int, reminder_type: str, fire_at: datetime) -> bool:
+        # False when the task was rescheduled (or fired elsewhere) since the
+        # row was read.
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                """
+                UPDATE reminder_schedule
+                SET fired_at = %s
+                WHERE task_id = %s AND reminder_type = %s AND fire_at = %s AND fired_at IS NULL
+                """,
+                (self.clock.now_str(), task_id, reminder_type, fire_at),
+            )
+            conn.commit()
+            return cursor.rowcount > 0
+        finally:
+            cursor.close()
+            conn.close()
+
+    def enqueue(self, pairs: list[tuple[dict, str]]) -> int:
+        # pairs: (candidate row, reminder_type). Each reminder lands in the
+        # student's in-app inbox and in the email outbox.
+        jobs = [self.outbox_job(row, reminder_type) for row, reminder_type in pairs]
+        inbox = [
+            self._inbox_item(row["student_id"], row, reminder_type) for row, reminder_type in pairs
+        ]
+        return self._queue(jobs, inbox)
+
+    def enqueue_digests(self, rows: list[dict]) -> int:
+        jobs = []
+        inbox = []
+        for row in rows:
+            jobs.extend(self.digest_jobs(row))
+            inbox.extend(
+                self._inbox_item(row["student_id"], item, item["reminder_type"])
+                for item in row["items"]
+            )
+        return self._queue(jobs, inbox)
+
+    def candidates(
+        self,
+        conn,
+        reminder_type: str,
+        deadline_from: Optional[datetime] = None,
+        deadline_to: Optional[datetime] = None,
+        task_id: Optional[int] = None,
+    ) -> Iterator[dict]:
+        # Every assigned student with an email who has not submitted and has
+        # not had this reminder queued or sent yet. conn should use an
+        # unbuffered cursor class so rows are streamed.
+        conditions = ["u.email IS NOT NULL"]
+        params: list = []
+        if task_id is not None:
+            conditions.append("t.id = %s")
+            params.append(task_id)
+        if deadline_from is not None:
+            conditions.append("t.deadline >= %s")
+            params.append(deadline_from)
+        if deadline_to is not None:
+            conditions.append("t.deadline <= %s")
+            params.append(deadline_to)
+        params.extend([reminder_type, reminder_type])
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                f"""
+                SELECT t.id AS task_id, t.title, t.deadline,
+                       u.id AS student_id, u.username, u.email
+                FROM tasks t
+                JOIN task_assignments a ON a.task_id = t.id
+                JOIN users u ON u.id = a.student_id
+                WHERE {" AND ".join(conditions)}
+                  AND NOT EXISTS (
+                      SELECT 1 FROM submissions s
+                      WHERE s.student_id = a.student_id AND s.task_id = t.id
+                  )
+                  AND NOT EXISTS (
+                      SELECT 1 FROM notification_outbox o
+                      WHERE o.task_id = t.id
+                        AND o.student_id = a.student_id
+                        AND o.reminder_type = %s
+                  )
+                  AND NOT EXISTS (
+                      SELECT 1 FROM reminder_logs r
+                      WHERE r.task_id = t.id
+                        AND r.student_id = a.student_id
+                        AND r.reminder_type = %s
+                  )
+                ORDER BY t.id, u.id
+                """,
+                params,
+            )
+            for row in cursor:
+                yield row
+        finally:
+            cursor.close()
+
+    def message(self, row: dict) -> tuple[str, str]:
+        subject = f"Homework reminder: {row['title']}"
+        body = (
+            f"Hi {row['username']},\n\n"
+            f"Reminder: '{row['title']}' is due at {row['deadline']} (KST).\n"
+            "Please submit before the deadline.\n"
+        )
+        return subject, body
+
+    def outbox_job(self, row: dict, reminder_type: str) -> tuple:
+        subject, body = self.message(row)
+        return (row["task_id"], row["student_id"], reminder_type, row["email"], subject, body, None)
+
+    def digest_candidates(self, conn, windows: list[tuple[str, str, str]]) -> Iterator[dict]:
+        # Same filters as candidates(), across every (reminder_type,
+        # deadline_from, deadline_to) window at once, grouped by MySQL into one
+        # row per student with their due tasks in "items".
+        window_sql = " UNION ALL ".join(
+            ["SELECT %s AS reminder_type, CAST(%s AS DATETIME) AS deadline_from, "
+             "CAST(%s AS DATETIME) AS deadline_to"] * len(windows)
+        )
+        params = [value for window in windows for value in window]
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                f"""
+                SELECT u.id AS student_id, u.username, u.email,
+                       JSON_ARRAYAGG(JSON_OBJECT(
+                           'task_id', t.id,
+                           'title', t.title,
+                           'deadline', CAST(t.deadline AS CHAR),
+                           'reminder_type', w.reminder_type
+                       )) AS items
+                FROM ({window_sql}) w
+                JOIN tasks t ON t.deadline BETWEEN w.deadline_from AND w.deadline_to
+                JOIN task_assignments a ON a.task_id = t.id
+                JOIN users u ON u.id = a.student_id
+                WHERE u.email IS NOT NULL
+                  AND NOT EXISTS (
+                      SELECT 1 FROM submissions s
+                      WHERE s.student_id = a.student_id AND s.task_id = t.id
+                  )
+                  AND NOT EXISTS (
+                      SELECT 1 FROM notification_outbox o
+                      WHERE o.task_id = t.id
+                        AND o.student_id = a.student_id
+                        AND o.reminder_type = w.reminder_type
+                  )
+                  AND NOT EXISTS (
+                      SELECT 1 FROM reminder_logs r
+                      WHERE r.task_id = t.id
+                        AND r.student_id = a.student_id
+                        AND r.reminder_type = w.reminder_type
+                  )
+                GROUP BY u.id, u.username, u.email
+                ORDER BY u.id
+                """,
+                params,
+            )
+            for row in cursor:
+                row["items"] = sorted(json.loads(row["items"]), key=lambda item: item["deadline"])
+                yield row
+        finally:
+            cursor.close()
+
+    def digest_message(self, row: dict) -> tuple[str, str]:
+        items = row["items"]
+        if len(items) == 1:
+            return self.message({**items[0], "username": row["username"]})
+
+        subject = f"Homework reminder: {len(items)} tasks due soon"
+        lines = [f"- '{item['title']}' is due at {item['deadline']} (KST)." for item in items]
+        body = (
+            f"Hi {row['username']},\n\n"
+            "Reminder: these tasks are due soon.\n"
+            + "\n".join(lines)
+            + "\n\nPlease submit before the deadlines.\n"
+        )
+        return subject, body
+
+    def claimed_digest_message(self, jobs: list[dict]) -> tuple[str, str]:
+        # The body queued with a digest lists every task it had then; claiming
+        # drops rows for tasks submitted since, so render it from what is left.
+        items = [
+            {
+                "task_id": job["task_id"],
+                "title": job["title"],
+                "deadline": job["deadline"],
+                "reminder_type": job["reminder_type"],
+            }
+            for job in jobs
+        ]
+        items.sort(key=lambda item: item["deadline"])
+        return self.digest_message({"username": jobs[0]["username"], "items": items})
+
+    def digest_jobs(self, row: dict) -> list[tuple]:
+        # One outbox row per (task, reminder) keeps enqueueing idempotent; the
+        # shared digest_id makes delivery send them as a single email.
+        subject, body = self.digest_message(row)
+        digest_id = uuid.uuid4().hex
+        return [
+            (
+                item["task_id"],
+                row["student_id"],
+                item["reminder_type"],
+                row["email"],
+                subject,
+                body,
+                digest_id,
+            )
+            for item in row["items"]
+        ]
+
+    def _inbox_item(self, student_id: int, task: dict, reminder_type: str) -> tuple:
+        return (
+            student_id,
+            "reminder",
+            f"'{task['title']}' is due soon",
+            f"Due at {task['deadline']} (KST). Please submit before the deadline.",
+            task["task_id"],
+            f"reminder:{task['task_id']}:{reminder_type}",
+        )
+
+    def _queue(self, jobs: list[tuple], inbox: list[tuple]) -> int:
+        self.notifications.publish(inbox)
+        return self.outbox.enqueue(jobs)
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+
+# Works on the caller's cursor so task_student_scores is written in the same
+# transaction as the submissions change it summarizes.
+class ScoreService:
+    def refresh(self, cursor, task_id: int, student_id: int) -> int:
+        cursor.execute(
+            """
+            SELECT best_points, awarded_at
+            FROM task_student_scores
+            WHERE student_id = %s AND task_id = %s
+            FOR UPDATE
+            """,
+            (student_id, task_id),
+        )
+        current = cursor.fetchone()
+        previous = int(current["best_points"]) if current else 0
+        previous_at = current["awarded_at"] if current else None
+
+        # awarded_at is when the best submission was graded, so a later lower
+        # grade does not move the points into a newer day.
+        cursor.execute(
+            """
+            SELECT awarded_points AS best_points, awarded_at
+            FROM submissions
+            WHERE task_id = %s AND student_id = %s AND awarded_points IS NOT NULL
+            ORDER BY awarded_points DESC, awarded_at
+            LIMIT 1
+            """,
+            (task_id, student_id),
+        )
+        row = cursor.fetchone()
+
+        if row is None or row["best_points"] is None:
+            cursor.execute(
+                "DELETE FROM task_student_scores WHERE student_id = %s AND task_id = %s",
+                (student_id, task_id),
+            )
+            self._apply_earned_delta(cursor, student_id, -previous)
+            self._move_daily_points(cursor, student_id, previous, previous_at, 0, None)
+            return -previous
+
+        best = int(row["best_points"])
+        cursor.execute(
+            """
+            INSERT INTO task_student_scores (student_id, task_id, best_points, awarded_at)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                best_points = VALUES(best_points),
+                awarded_at = VALUES(awarded_at)
+            """,
+            (student_id, task_id, best, row["awarded_at"]),
+        )
+        self._apply_earned_delta(cursor, student_id, best - previous)
+        self._move_daily_points(
+            cursor, student_id, previous, previous_at, best, row["awarded_at"]
+        )
+        return best - previous
+
+    def forget_task(self, cursor, task_id: int) -> None:
+        # Called before deleting a task: the cascade drops its score rows, so
+        # take their points back out of the per-student and per-day totals.
+        cursor.execute(
+            """
+            UPDATE users u
+            JOIN task_student_scores sc ON sc.student_id = u.id
+            SET u.earned_points = GREATEST(u.earned_points - sc.best_points, 0)
+            WHERE sc.task_id = %s
+            """,
+            (task_id,),
+        )
+        cursor.execute(
+            """
+            UPDATE student_daily_points d
+            JOIN task_student_scores sc
+              ON sc.student_id = d.student_id AND d.day = DATE(sc.awarded_at)
+            SET d.points = d.points - sc.best_points
+            WHERE sc.task_id = %s
+            """,
+            (task_id,),
+        )
+
+    def rebuild(self, conn) -> int:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("DELETE FROM task_student_scores")
+            cursor.execute(
+                """
+                INSERT INTO task_student_scores (student_id, task_id, best_points, awarded_at)
+                SELECT s.student_id, s.task_id, best.points, MIN(s.awarded_at)
+                FROM submissions s
+                JOIN (
+                    SELECT student_id, task_id, MAX(awarded_points) AS points
+                    FROM submissions
+                    WHERE awarded_points IS NOT NULL
+                    GROUP BY student_id, task_id
+                ) best
+                  ON best.student_id = s.student_id
+                 AND best.task_id = s.task_id
+                 AND best.points = s.awarded_points
+                GROUP BY s.student_id, s.task_id, best.points
+                """
+            )
+            inserted = cursor.rowcount
+            cursor.execute(
+                """
+                UPDATE users u
+                LEFT JOIN (
+                    SELECT student_id, SUM(best_points) AS total_points
+                    FROM task_student_scores
+                    GROUP BY student_id
+                ) earned ON earned.student_id = u.id
+                SET u.earned_points = COALESCE(earned.total_points, 0)
+                """
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+        return inserted
+
+    def rebuild_daily_points(self, conn, chunk_size: int = 500) -> int:
+        # Each chunk of students is deleted and refilled in one transaction,
+        # so the windowed leaderboards never see a student half rebuilt.
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT id FROM users WHERE role = 'student' ORDER BY id")
+            student_ids = [row["id"] for row in cursor.fetchall()]
+            for start in range(0, len(student_ids), chunk_size):
+                chunk = student_ids[start:start + chunk_size]
+                placeholders = ", ".join(["%s"] * len(chunk))
+                cursor.execute(
+                    f"DELETE FROM student_daily_points WHERE student_id IN ({placeholders})",
+                    chunk,
+                )
+                cursor.execute(
+                    f"""
+                    INSERT INTO student_daily_points (student_id, day, points)
+                    SELECT student_id, DATE(awarded_at), SUM(best_points)
+                    FROM task_student_scores
+                    WHERE awarded_at IS NOT NULL AND student_id IN ({placeholders})
+                    GROUP BY student_id, DATE(awarded_at)
+                    """,
+                    chunk,
+                )
+                conn.commit()
+
+            cursor.execute("SELECT COUNT(*) AS total FROM student_daily_points")
+            return cursor.fetchone()["total"]
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def diff_user_points(self, conn) -> list[dict]:
+        # Manual point edits by tutors show up here too, so this only reports.
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                """
+                SELECT u.id,
+                       u.username,
+                       u.points,
+                       CAST(COALESCE(earned.total_points, 0) AS SIGNED) AS earned_points,
+                       CAST(COALESCE(spent.total_cost, 0) AS SIGNED) AS spent_points
+                FROM users u
+                LEFT JOIN (
+                    SELECT student_id, SUM(best_points) AS total_points
+                    FROM task_student_scores
+                    GROUP BY student_id
+                ) earned ON earned.student_id = u.id
+                LEFT JOIN (
+                    SELECT student_id, SUM(cost_at_purchase) AS total_cost
+                    FROM purchases
+                    GROUP BY student_id
+                ) spent ON spent.student_id = u.id
+                WHERE u.role = 'student'
+                ORDER BY u.username
+                """
+            )
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+
+        drift = []
+        for row in rows:
+            expected = max(row["earned_points"] - row["spent_points"], 0)
+            if expected != row["points"]:
+                row["expected_points"] = expected
+                row["difference"] = row["points"] - expected
+                drift.append(row)
+        return drift
+
+    def _apply_earned_delta(self, cursor, student_id: int, delta: int) -> None:
+        if delta == 0:
+            return
+        cursor.execute(
+            "UPDATE users SET earned_points = GREATEST(earned_points + %s, 0) WHERE id = %s",
+            (delta, student_id),
+        )
+
+    def _move_daily_points(
+        self, cursor, student_id: int, old_points: int, old_at, new_points: int, new_at
+    ) -> None:
+        if old_points == new_points and old_at == new_at:
+            return
+        rows = []
+        if old_points and old_at is not None:
+            rows.append((student_id, old_at, -old_points))
+        if new_points and new_at is not None:
+            rows.append((student_id, new_at, new_points))
+        if rows:
+            cursor.executemany(
+                """
+                INSERT INTO student_daily_points (student_id, day, points)
+                VALUES (%s, DATE(%s), %s)
+                ON DUPLICATE KEY UPDATE points = points + VALUES(points)
+                """,
+                rows,
+            )
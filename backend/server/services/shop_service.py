@@ -1,22 +1,56 @@
 from __future__ import annotations
 
+import json
 from typing import Optional
 
+from ..cache import Cache, QueryCache, RewardCatalogCache, SingleFlight, reads
 from ..db import get_db
+from ..events import EventBus
 from ..models import Reward
-from .core import ServiceError, TimeProvider
+from .change_log_service import ChangeLogService
+from .core import DateTimeParser, KeysetCursor, ServiceError, TimeProvider
+from .shop_stats_service import ShopStatsService
 
 
 class ShopService:
-    def __init__(self, clock: Optional[TimeProvider] = None):
+    def __init__(
+        self,
+        clock: Optional[TimeProvider] = None,
+        sold_out: Optional[Cache] = None,
+        catalog: Optional[RewardCatalogCache] = None,
+        stats: Optional[ShopStatsService] = None,
+        events: Optional[EventBus] = None,
+        changes: Optional[ChangeLogService] = None,
+        flights: Optional[SingleFlight] = None,
+        query_cache: Optional[QueryCache] = None,
+    ):
         self.clock = clock or TimeProvider()
+        self.sold_out = sold_out
+        self.catalog = catalog
+        self.stats = stats or ShopStatsService(self.clock)
+        self.events = events
+        self.changes = changes or ChangeLogService(self.clock)
+        self.flights = flights
+        self.query_cache = query_cache
+        self.parser = DateTimeParser()
+        self.cursors = KeysetCursor()
 
     def list_rewards(self, user: Optional[dict]) -> list[dict]:
+        if self.flights is None:
+            return self._fetch_rewards()
+        return self.flights.do(("list_rewards",), self._fetch_rewards)
+
+    def _fetch_rewards(self) -> list[dict]:
         conn = get_db()
         cursor = conn.cursor()
         try:
             cursor.execute(
-                "SELECT id, title, description, cost FROM rewards ORDER BY created_at DESC"
+                """
+                SELECT id, title, description, cost, stock, per_student_limit
+                FROM rewards
+                WHERE active = 1
+                ORDER BY created_at DESC
+                """
             )
             rewards = cursor.fetchall()
         finally:
@@ -24,7 +58,58 @@ class ShopService:
             conn.close()
         return rewards
 
-    def create_reward(self, teacher: dict, title: str, description: Optional[str], cost):
+    def get_rewards(self, reward_ids: list[int]) -> list[dict]:
+        # Active rewards among reward_ids, shaped like list_rewards.
+        if not reward_ids:
+            return []
+        placeholders = ", ".join(["%s"] * len(reward_ids))
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                f"""
+                SELECT id, title, description, cost, stock, per_student_limit
+                FROM rewards
+                WHERE active = 1 AND id IN ({placeholders})
+                """,
+                list(reward_ids),
+            )
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def reward_catalog(self) -> tuple[Optional[str], bytes]:
+        if self.catalog is None:
+            return None, self._serialize_catalog()
+
+        version, payload = self.catalog.lookup()
+        if payload is None:
+            payload = self._serialize_catalog()
+            self.catalog.store(version, payload)
+        return self.catalog.etag(version), payload
+
+    def reward_stock(self) -> dict:
+        # Live stock of the active limited rewards, read past the catalog.
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "SELECT id, stock FROM rewards WHERE active = 1 AND stock IS NOT NULL"
+            )
+            return {str(row["id"]): row["stock"] for row in cursor.fetchall()}
+        finally:
+            cursor.close()
+            conn.close()
+
+    def create_reward(
+        self,
+        teacher: dict,
+        title: str,
+        description: Optional[str],
+        cost,
+        limits: Optional[dict] = None,
+    ):
         if not title or cost is None:
             raise ServiceError("Title and cost are required.")
 
@@ -33,19 +118,40 @@ class ShopService:
         except (TypeError, ValueError):
             raise ServiceError("Cost must be a number.")
 
+        limits = self._parse_limits(limits or {})
+
         conn = get_db()
         cursor = conn.cursor()
         try:
             cursor.execute(
-                "INSERT INTO rewards (title, description, cost, created_by) VALUES (%s, %s, %s, %s)",
-                (title, description, cost_value, teacher["id"]),
+                """
+                INSERT INTO rewards (title, description, cost, stock, per_student_limit, created_by)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                """,
+                (
+                    title,
+                    description,
+                    cost_value,
+                    limits.get("stock"),
+                    limits.get("per_student_limit"),
+                    teacher["id"],
+                ),
             )
+            reward_id = cursor.lastrowid
+            self.changes.record(cursor, "reward", [reward_id])
             conn.commit()
         finally:
             cursor.close()
             conn.close()
 
-    def update_reward(self, reward_id: int, title, description, cost) -> None:
+        self._bump_catalog()
+        self._publish_reward(reward_id)
+
+    def update_reward(
+        self, reward_id: int, title, description, cost, limits: Optional[dict] = None
+    ) -> None:
+        limits = self._parse_limits(limits or {})
+
         conn = get_db()
         cursor = conn.cursor()
         try:
@@ -56,45 +162,88 @@ class ShopService:
                 except (TypeError, ValueError):
                     raise ServiceError("Cost must be a number.")
 
+            # stock and per_student_limit may be set back to NULL (unlimited),
+            # so only the keys that were sent are written.
+            limit_clauses = "".join(f"{column} = %s, " for column in limits)
+
             cursor.execute(
-                """
+                f"""
                 UPDATE rewards
                 SET title = COALESCE(%s, title),
                     description = COALESCE(%s, description),
                     cost = COALESCE(%s, cost),
-                    updated_at = %s
+                    {limit_clauses}updated_at = %s
                 WHERE id = %s
                 """,
                 (
                     title,
                     description,
                     cost_value,
+                    *limits.values(),
                     self.clock.now_str(),
                     reward_id,
                 ),
             )
+            self.changes.record(cursor, "reward", [reward_id])
             conn.commit()
         finally:
             cursor.close()
             conn.close()
 
+        self._clear_sold_out(reward_id)
+        self._bump_catalog()
+        self._publish_reward(reward_id)
+
     def delete_reward(self, reward_id: int) -> bool:
         conn = get_db()
         cursor = conn.cursor()
         try:
+            # Purchases of the reward lose their reward_id through the foreign
+            # key, which changes the purchase lists they appear in.
+            cursor.execute(
+                "SELECT id, student_id FROM purchases WHERE reward_id = %s FOR UPDATE",
+                (reward_id,),
+            )
+            purchases = [(row["id"], row["student_id"]) for row in cursor.fetchall()]
             cursor.execute("DELETE FROM rewards WHERE id = %s", (reward_id,))
+            deleted = cursor.rowcount > 0
+            if deleted:
+                self.changes.record(cursor, "reward", [reward_id], op="delete")
+                self.changes.record_rows(cursor, "purchase", purchases)
             conn.commit()
-            return cursor.rowcount > 0
+        except Exception:
+            conn.rollback()
+            raise
         finally:
             cursor.close()
             conn.close()
 
+        self._clear_sold_out(reward_id)
+        self._bump_catalog()
+        if deleted:
+            self._publish_reward(reward_id)
+        return deleted
+
     def purchase_reward(self, student: dict, reward_id: int) -> None:
+        # Once a limited reward runs out, later buyers are turned away here
+        # without opening a connection.
+        if self.sold_out is not None and self.sold_out.get(reward_id):
+            raise ServiceError("Reward is sold out.", status=409)
+
         conn = get_db()
         cursor = conn.cursor()
         try:
+            # Lock the student first: concurrent purchases by the same student
+            # queue here, before the first plain read fixes this transaction's
+            # snapshot, so the purchase limit count below sees the ones that
+            # committed ahead of it.
+            cursor.execute("SELECT id FROM users WHERE id = %s FOR UPDATE", (student["id"],))
             cursor.execute(
-                "SELECT id, title, description, cost FROM rewards WHERE id = %s",
+                """
+                SELECT id, title, description, cost, stock, per_student_limit
+                FROM rewards
+                WHERE id = %s
+                """,
                 (reward_id,),
             )
             reward_row = cursor.fetchone()
@@ -107,15 +256,53 @@ class ShopService:
                 description=reward_row.get("description"),
                 cost=reward_row["cost"],
                 created_by=0,
+                stock=reward_row.get("stock"),
+                per_student_limit=reward_row.get("per_student_limit"),
             )
 
-            if student["points"] < reward.cost:
+            if reward.stock is not None and reward.stock <= 0:
+                self._mark_sold_out(reward_id)
+                raise ServiceError("Reward is sold out.", status=409)
+
+            # Take the reward row lock before the inserts. The purchase and
+            # ledger inserts below check their foreign keys against this row
+            # with a shared lock; a buyer holding that while waiting to
+            # decrement would deadlock against another one doing the same.
+            remaining = None
+            if reward.stock is not None:
+                cursor.execute(
+                    "UPDATE rewards SET stock = stock - 1 WHERE id = %s AND stock > 0",
+                    (reward_id,),
+                )
+                if cursor.rowcount == 0:
+                    self._mark_sold_out(reward_id)
+                    raise ServiceError("Reward is sold out.", status=409)
+                cursor.execute("SELECT stock FROM rewards WHERE id = %s", (reward_id,))
+                remaining = cursor.fetchone()["stock"]
+
+            # Conditional relative debit: the balance read back afterwards is
+            # the one this debit produced.
+            cursor.execute(
+                "UPDATE users SET points = points - %s WHERE id = %s AND points >= %s",
+                (reward.cost, student["id"], reward.cost),
+            )
+            # rowcount counts changed rows, so a free reward reports 0 as well.
+            if cursor.rowcount == 0 and reward.cost != 0:
                 raise ServiceError("too small points", status=400)
 
-            points_before = int(student["points"])
-            points_after = max(points_before - int(reward.cost), 0)
+            cursor.execute("SELECT points FROM users WHERE id = %s", (student["id"],))
+            points_after = int(cursor.fetchone()["points"])
+            points_before = points_after + int(reward.cost)
             purchased_at = self.clock.now_str()
 
+            if reward.per_student_limit is not None:
+                cursor.execute(
+                    "SELECT COUNT(*) AS total FROM purchases WHERE reward_id = %s AND student_id = %s",
+                    (reward_id, student["id"]),
+                )
+                if cursor.fetchone()["total"] >= reward.per_student_limit:
+                    raise ServiceError("Purchase limit reached.", status=409)
+
             cursor.execute(
                 """
                 INSERT INTO purchases (reward_id, student_id, cost_at_purchase, purchased_at)
@@ -157,11 +344,26 @@ class ShopService:
                     purchased_at,
                 ),
             )
-            cursor.execute(
-                "UPDATE users SET points = %s WHERE id = %s",
-                (points_after, student["id"]),
+            # Every purchase of the reward that day upserts the same rollup row,
+            # so it goes last (only the change_log entry follows) and its lock
+            # is held just for the commit.
+            self.stats.record_purchase(
+                cursor, reward_id, reward.title, reward.cost, purchased_at
             )
+            # Last before commit: the seq taken here versions /purchases, and
+            # readers stop at it until it commits.
+            self.changes.record(cursor, "purchase", [purchase_id], audience_id=student["id"])
+            if remaining is not None:
+                self.changes.record(cursor, "reward", [reward_id])
+
             conn.commit()
+            self._bump_tables("users", "purchases", "reward_purchase_ledger")
+            # The catalog is only rebuilt when the reward sells out; until then
+            # its stock may lag, and reward_stock() has the live numbers.
+            if remaining == 0:
+                self._mark_sold_out(reward_id)
+                self._bump_catalog()
+                self._publish_reward(reward_id)
         except ServiceError:
             conn.rollback()
             raise
@@ -172,46 +374,155 @@ class ShopService:
             cursor.close()
             conn.close()
 
-    def list_all_purchases(self) -> list[dict]:
-        conn = get_db()
-        cursor = conn.cursor()
-        try:
-            cursor.execute(
-                """
-                SELECT l.id,
-                       l.purchased_at,
-                       l.cost_at_purchase,
-                       l.reward_title AS title,
-                       l.student_username AS username,
-                       l.student_email AS email
-                FROM reward_purchase_ledger l
-                ORDER BY l.purchased_at DESC
-                """
+    @reads("reward_purchase_ledger")
+    def list_all_purchases(
+        self,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        filters: Optional[dict] = None,
+    ) -> dict:
+        return self._list_ledger(
+            """
+            SELECT l.id,
+                   l.purchased_at,
+                   l.cost_at_purchase,
+                   l.reward_id,
+                   l.student_id,
+                   l.reward_title AS title,
+                   l.student_username AS username,
+                   l.student_email AS email
+            FROM reward_purchase_ledger l
+            """,
+            limit,
+            cursor,
+            filters or {},
+        )
+
+    @reads("reward_purchase_ledger")
+    def list_purchases(
+        self,
+        student_id: int,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        filters: Optional[dict] = None,
+    ) -> dict:
+        filters = dict(filters or {})
+        filters["studentId"] = student_id
+        return self._list_ledger(
+            """
+            SELECT l.id,
+                   l.purchased_at,
+                   l.cost_at_purchase,
+                   l.reward_id,
+                   l.reward_title AS title
+            FROM reward_purchase_ledger l
+            """,
+            limit,
+            cursor,
+            filters,
+        )
+
+    def _serialize_catalog(self) -> bytes:
+        rewards = self.list_rewards(None)
+        return json.dumps({"rewards": rewards}, separators=(",", ":")).encode("utf-8")
+
+    def _bump_catalog(self) -> None:
+        # Drop the shared list first so the rebuild cannot reuse a read that
+        # started before this write.
+        if self.flights is not None:
+            self.flights.forget(("list_rewards",))
+        if self.catalog is not None:
+            self.catalog.bump()
+        self._bump_tables("rewards")
+
+    def _bump_tables(self, *tables: str) -> None:
+        if self.query_cache is not None:
+            self.query_cache.bump(*tables)
+
+    def _publish_reward(self, reward_id: Optional[int]) -> None:
+        if self.events is not None:
+            self.events.publish("reward.changed", {"rewardId": reward_id})
+
+    def _list_ledger(
+        self, select: str, limit: Optional[int], cursor: Optional[str], filters: dict
+    ) -> dict:
+        # Newest first on (purchased_at, id); every filter combination has an
+        # index ending in those two columns so a page is a short range scan.
+        conditions = []
+        params: list = []
+        for key, column in (("rewardId", "l.reward_id"), ("studentId", "l.student_id")):
+            value = filters.get(key)
+            if value is not None:
+                conditions.append(f"{column} = %s")
+                params.append(value)
+        # "from" is inclusive and "to" exclusive, so whole days chain cleanly.
+        for key, operator in (("from", ">="), ("to", "<")):
+            value = filters.get(key)
+            if value is None:
+                continue
+            normalized = self.parser.normalize_input(value)
+            if normalized is None:
+                raise ServiceError(f"Invalid '{key}' date.")
+            conditions.append(f"l.purchased_at {operator} %s")
+            params.append(normalized)
+        if cursor:
+            purchased_at, ledger_id = self.cursors.decode(cursor, 2)
+            conditions.append(
+                "(l.purchased_at < %s OR (l.purchased_at = %s AND l.id < %s))"
             )
-            purchases = cursor.fetchall()
-        finally:
-            cursor.close()
-            conn.close()
-        return purchases
+            params.extend([purchased_at, purchased_at, ledger_id])
+
+        query = select
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY l.purchased_at DESC, l.id DESC"
+        if limit is not None:
+            query += " LIMIT %s"
+            params.append(limit + 1)
 
-    def list_purchases(self, student_id: int) -> list[dict]:
         conn = get_db()
-        cursor = conn.cursor()
+        db_cursor = conn.cursor()
         try:
-            cursor.execute(
-                """
-                SELECT l.id,
-                       l.purchased_at,
-                       l.cost_at_purchase,
-                       l.reward_title AS title
-                FROM reward_purchase_ledger l
-                WHERE l.student_id = %s
-                ORDER BY l.purchased_at DESC
-                """,
-                (student_id,),
-            )
-            purchases = cursor.fetchall()
+            db_cursor.execute(query, params)
+            rows = db_cursor.fetchall()
         finally:
-            cursor.close()
+            db_cursor.close()
             conn.close()
-        return purchases
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = self.cursors.encode(
+                self.parser.normalize_input(last["purchased_at"]), last["id"]
+            )
+        return {"purchases": rows, "nextCursor": next_cursor}
+
+    def _parse_limits(self, limits: dict) -> dict:
+        parsed = {}
+        for key, column, minimum in (
+            ("stock", "stock", 0),
+            ("perStudentLimit", "per_student_limit", 1),
+        ):
+            if key not in limits:
+                continue
+            value = limits[key]
+            if value is None:
+                parsed[column] = None
+                continue
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise ServiceError(f"{key} must be a number.")
+            if value < minimum:
+                raise ServiceError(f"{key} must be at least {minimum}.")
+            parsed[column] = value
+        return parsed
+
+    def _mark_sold_out(self, reward_id: int) -> None:
+        if self.sold_out is not None:
+            self.sold_out.set(reward_id, True)
+
+    def _clear_sold_out(self, reward_id: int) -> None:
+        if self.sold_out is not None:
+            self.sold_out.delete(reward_id)
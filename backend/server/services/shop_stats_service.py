@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import Optional
+
+from ..db import get_db
+from .core import ServiceError, TimeProvider
+
+
+# Ledger rows whose reward was deleted before the rollups existed have no
+# reward_id left; the backfill files them under this id.
+DELETED_REWARD_ID = 0
+
+
+class ShopStatsService:
+    BUCKETS = {
+        "day": "s.day",
+        "week": "DATE_SUB(s.day, INTERVAL WEEKDAY(s.day) DAY)",
+        "month": "DATE_SUB(s.day, INTERVAL DAYOFMONTH(s.day) - 1 DAY)",
+    }
+
+    def __init__(self, clock: Optional[TimeProvider] = None):
+        self.clock = clock or TimeProvider()
+
+    def record_purchase(
+        self, cursor, reward_id: int, reward_title: str, cost: int, purchased_at
+    ) -> None:
+        # Runs on the purchase's cursor so the rollup commits with the ledger row.
+        # The row is shared by every buyer of the reward that day, so callers
+        # run this at the end of their transaction.
+        cursor.execute(
+            """
+            INSERT INTO reward_sales_daily (reward_id, day, reward_title, purchases, points_spent)
+            VALUES (%s, DATE(%s), %s, 1, %s)
+            ON DUPLICATE KEY UPDATE
+                reward_title = VALUES(reward_title),
+                purchases = purchases + 1,
+                points_spent = points_spent + VALUES(points_spent)
+            """,
+            (reward_id, purchased_at, reward_title, cost),
+        )
+
+    def stats(self, days: int = 90, bucket: str = "week", top: int = 5) -> dict:
+        if bucket not in self.BUCKETS:
+            raise ServiceError("bucket must be one of day, week, month.")
+
+        since = self.clock.now().date() - timedelta(days=days - 1)
+        bucket_expr = self.BUCKETS[bucket]
+
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                """
+                SELECT CAST(COALESCE(SUM(s.purchases), 0) AS SIGNED) AS purchases,
+                       CAST(COALESCE(SUM(s.points_spent), 0) AS SIGNED) AS points_spent,
+                       COUNT(DISTINCT s.reward_id) AS rewards
+                FROM reward_sales_daily s
+                WHERE s.day >= %s
+                """,
+                (since,),
+            )
+            totals = cursor.fetchone()
+
+            cursor.execute(
+                """
+                SELECT s.reward_id,
+                       MAX(s.reward_title) AS title,
+                       CAST(SUM(s.purchases) AS SIGNED) AS purchases,
+                       CAST(SUM(s.points_spent) AS SIGNED) AS points_spent
+                FROM reward_sales_daily s
+                WHERE s.day >= %s
+                GROUP BY s.reward_id
+                ORDER BY purchases DESC, points_spent DESC, s.reward_id ASC
+                LIMIT %s
+                """,
+                (since, top),
+            )
+            top_rewards = cursor.fetchall()
+
+            cursor.execute(
+                f"""
+                SELECT {bucket_expr} AS period,
+                       CAST(SUM(s.purchases) AS SIGNED) AS purchases,
+                       CAST(SUM(s.points_spent) AS SIGNED) AS points_spent
+                FROM reward_sales_daily s
+                WHERE s.day >= %s
+                GROUP BY period
+                ORDER BY period ASC
+                """,
+                (since,),
+            )
+            series = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+        for row in series:
+            row["period"] = row["period"].isoformat()
+        return {
+            "since": since.isoformat(),
+            "bucket": bucket,
+            "totals": totals,
+            "topRewards": top_rewards,
+            "series": series,
+        }
+
+    def rebuild(self, conn, chunk_days: int = 31) -> int:
+        # Replays the ledger a range of days at a time. Each range is deleted
+        # and refilled in one transaction: the delete locks the range first,
+        # so a purchase committing meanwhile waits and adds itself on top of
+        # the replay, which read the ledger only after taking those locks.
+        # The day span is pinned up front; later days only get live upserts.
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                """
+                SELECT MIN(first_day) AS first_day, MAX(last_day) AS last_day
+                FROM (
+                    SELECT MIN(DATE(purchased_at)) AS first_day,
+                           MAX(DATE(purchased_at)) AS last_day
+                    FROM reward_purchase_ledger
+                    UNION ALL
+                    SELECT MIN(day), MAX(day) FROM reward_sales_daily
+                ) span
+                """
+            )
+            span = cursor.fetchone()
+            conn.commit()
+            if span["first_day"] is None:
+                return 0
+
+            day = span["first_day"]
+            while day <= span["last_day"]:
+                until = day + timedelta(days=chunk_days)
+                cursor.execute(
+                    "DELETE FROM reward_sales_daily WHERE day >= %s AND day < %s",
+                    (day, until),
+                )
+                cursor.execute(
+                    """
+                    SELECT COALESCE(reward_id, %s) AS reward_id,
+                           DATE(purchased_at) AS day,
+                           IF(reward_id IS NULL, 'Deleted rewards', MAX(reward_title)) AS title,
+                           COUNT(*) AS purchases,
+                           SUM(cost_at_purchase) AS points_spent
+                    FROM reward_purchase_ledger
+                    WHERE purchased_at >= %s AND purchased_at < %s
+                    GROUP BY reward_id, DATE(purchased_at)
+                    """,
+                    (DELETED_REWARD_ID, day, until),
+                )
+                rows = cursor.fetchall()
+                if rows:
+                    cursor.executemany(
+                        """
+                        INSERT INTO reward_sales_daily (
+                            reward_id, day, reward_title, purchases, points_spent
+                        )
+                        VALUES (%s, %s, %s, %s, %s)
+                        ON DUPLICATE KEY UPDATE
+                            reward_title = VALUES(reward_title),
+                            purchases = purchases + VALUES(purchases),
+                            points_spent = points_spent + VALUES(points_spent)
+                        """,
+                        [
+                            (
+                                row["reward_id"],
+                                row["day"],
+                                row["title"],
+                                row["purchases"],
+                                row["points_spent"],
+                            )
+                            for row in rows
+                        ],
+                    )
+                conn.commit()
+                day = until
+
+            cursor.execute("SELECT COUNT(*) AS total FROM reward_sales_daily")
+            return cursor.fetchone()["total"]
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
@@ -1,10 +1,52 @@
 from __future__ import annotations
 
+from datetime import timedelta
+from typing import Any, Callable, Iterator, Optional
+
+import pymysql
+
+from ..cache import QueryCache, SingleFlight, StudentProgressCache, reads
 from ..db import get_db
+from ..leaderboard import RankedLeaderboard
+from .core import KeysetCursor, ServiceError, TimeProvider
 
 
 class StudentService:
+    WINDOWS = ("week", "month", "all")
+    # Single-flight key of the full board; dropped on every score change.
+    LEADERBOARD_FLIGHT = ("leaderboard",)
+
+    def __init__(
+        self,
+        board: Optional[RankedLeaderboard] = None,
+        clock: Optional[TimeProvider] = None,
+        progress_cache: Optional[StudentProgressCache] = None,
+        flights: Optional[SingleFlight] = None,
+        query_cache: Optional[QueryCache] = None,
+    ):
+        self.board = board
+        self.clock = clock or TimeProvider()
+        self.progress_cache = progress_cache
+        self.flights = flights
+        self.query_cache = query_cache
+        self.cursors = KeysetCursor()
+
     def leaderboard(self) -> list[dict]:
+        # Everyone gets the same board, so a burst of requests shares one build.
+        return self._shared(self.LEADERBOARD_FLIGHT, self._build_leaderboard)
+
+    def leaderboard_window(self, window: str) -> list[dict]:
+        if window == "all":
+            return self.leaderboard()
+        if window not in self.WINDOWS:
+            raise ServiceError("window must be one of week, month, all.")
+
+        today = self.clock.now().date()
+        if window == "week":
+            since = today - timedelta(days=today.weekday())
+        else:
+            since = today.replace(day=1)
+
         conn = get_db()
         cursor = conn.cursor()
         try:
@@ -12,159 +54,471 @@ class StudentService:
                 """
                 SELECT u.id,
                        u.username,
-                       COALESCE(earned.total_points, 0) AS total_points
+                       CAST(COALESCE(SUM(d.points), 0) AS SIGNED) AS total_points
                 FROM users u
-                LEFT JOIN (
-                    SELECT student_id, SUM(max_awarded) AS total_points
-                    FROM (
-                        SELECT student_id, task_id, MAX(awarded_points) AS max_awarded
-                        FROM submissions
-                        WHERE awarded_points IS NOT NULL
-                        GROUP BY student_id, task_id
-                    ) grouped
-                    GROUP BY student_id
-                ) earned ON earned.student_id = u.id
+                LEFT JOIN student_daily_points d
+                  ON d.student_id = u.id AND d.day >= %s
                 WHERE u.role = 'student'
+                GROUP BY u.id, u.username
                 ORDER BY total_points DESC, u.username ASC
-                """
+                """,
+                (since,),
             )
             rows = cursor.fetchall()
         finally:
             cursor.close()
             conn.close()
 
-        leaderboard_rows = []
-        current_rank = 0
-        last_points = None
-        for index, row in enumerate(rows):
-            if last_points is None or row["total_points"] != last_points:
-                current_rank = index + 1
-                last_points = row["total_points"]
-            leaderboard_rows.append(
-                {
-                    "username": row["username"],
-                    "total_points": row["total_points"],
-                    "rank": current_rank,
-                }
-            )
+        ranked_rows = self._rank_rows(rows)
+        return self._present_rows(ranked_rows, len(ranked_rows))
+
+    def leaderboard_page(self, limit: int, cursor: Optional[str] = None) -> dict:
+        after = None
+        if cursor:
+            total_points, username = self.cursors.decode(cursor, 2)
+            try:
+                after = (int(total_points), str(username))
+            except (TypeError, ValueError) as exc:
+                raise ServiceError("Invalid cursor.") from exc
+
+        if self.board is not None:
+            self._ensure_board_loaded()
+            offset = self.board.index_after(*after) if after else 0
+            ranked_rows = self.board.rows(offset, limit + 1)
+            total_students = len(self.board)
+        else:
+            ranked_rows, total_students = self._fetch_leaderboard_page(limit + 1, after)
 
-        total_students = len(leaderboard_rows)
-        for row in leaderboard_rows:
-            row["tier"] = self._assign_tier(row["rank"], total_students)
+        has_more = len(ranked_rows) > limit
+        ranked_rows = ranked_rows[:limit]
+        next_cursor = None
+        if has_more and ranked_rows:
+            last = ranked_rows[-1]
+            next_cursor = self.cursors.encode(last["total_points"], last["username"])
 
-        return leaderboard_rows
+        return {
+            "leaderboard": self._present_rows(ranked_rows, total_students),
+            "nextCursor": next_cursor,
+            "total": total_students,
+        }
+
+    def leaderboard_position(self, student_id: int, neighbors: int = 2) -> Optional[dict]:
+        if self.board is not None:
+            self._ensure_board_loaded()
+            position = self.board.position(student_id)
+            if position is None:
+                return None
+            start = max(position["index"] - neighbors, 0)
+            window = self.board.rows(start, position["index"] - start + neighbors + 1)
+            total_students = len(self.board)
+        else:
+            window, total_students = self._fetch_leaderboard_window(student_id, neighbors)
+            if not window:
+                return None
+
+        rows = self._present_rows(window, total_students)
+        me = next(row for row, ranked in zip(rows, window) if ranked["id"] == student_id)
+        return {
+            "username": me["username"],
+            "total_points": me["total_points"],
+            "rank": me["rank"],
+            "tier": me["tier"],
+            "total": total_students,
+            "neighbors": rows,
+        }
+
+    def reload_leaderboard(self) -> None:
+        if self.board is not None:
+            self.board.load(self._fetch_leaderboard_totals())
 
     def student_progress(self, student: dict) -> dict:
+        cache_key = None
+        tasks = None
+        if self.progress_cache is not None:
+            cache_key = self.progress_cache.progress_key(student["id"])
+            tasks = self.progress_cache.get(cache_key)
+
+        if tasks is None:
+            conn = get_db()
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    """
+                    SELECT t.id,
+                           t.title,
+                           t.description,
+                           t.deadline,
+                           t.points,
+                           (
+                               SELECT MAX(s.submitted_at)
+                               FROM submissions s
+                               WHERE s.student_id = a.student_id AND s.task_id = a.task_id
+                           ) AS last_submitted_at,
+                           sc.best_points AS awarded_points
+                    FROM task_assignments a
+                    JOIN tasks t ON t.id = a.task_id
+                    LEFT JOIN task_student_scores sc
+                      ON sc.student_id = a.student_id AND sc.task_id = a.task_id
+                    WHERE a.student_id = %s
+                    """,
+                    (student["id"],),
+                )
+                tasks = cursor.fetchall()
+            finally:
+                cursor.close()
+                conn.close()
+
+            for task in tasks:
+                task["status"] = (
+                    "completed" if task["last_submitted_at"] is not None else "pending"
+                )
+
+            if cache_key is not None:
+                self.progress_cache.set(cache_key, tasks)
+
+        return {"tasks": tasks, "points": student["points"]}
+
+    @reads("users")
+    def list_students(self) -> list[dict]:
         conn = get_db()
         cursor = conn.cursor()
         try:
             cursor.execute(
-                """
-                SELECT t.id, t.title, t.description, t.deadline, t.points
-                FROM tasks t
-                JOIN task_assignments a ON a.task_id = t.id
-                WHERE a.student_id = %s
-                """,
-                (student["id"],),
-            )
-            tasks = cursor.fetchall()
-
-            cursor.execute(
-                "SELECT task_id FROM submissions WHERE student_id = %s",
-                (student["id"],),
+                "SELECT id, username, email, points FROM users WHERE role = 'student' ORDER BY username"
             )
-            submissions = cursor.fetchall()
+            students = cursor.fetchall()
         finally:
             cursor.close()
             conn.close()
+        return students
 
-        submitted_task_ids = {row["task_id"] for row in submissions}
+    def students_overview(
+        self,
+        teacher_id: int,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        overdue_only: bool = False,
+    ) -> Iterator[dict]:
+        # Decode eagerly so a bad cursor fails before the response starts.
+        after = None
+        if cursor:
+            username, student_id = self.cursors.decode(cursor, 2)
+            try:
+                after = (str(username), int(student_id))
+            except (TypeError, ValueError) as exc:
+                raise ServiceError("Invalid cursor.") from exc
+        if self.flights is None or limit is None:
+            return self._stream_students_overview(teacher_id, limit, after, overdue_only)
 
-        for task in tasks:
-            task["status"] = (
-                "completed" if task["id"] in submitted_task_ids else "pending"
-            )
+        # A page is bounded, so concurrent requests for it share one collected
+        # read. It carries every tutor's tasks and is trimmed per tutor below;
+        # only the overdue filter, which picks students per tutor, keeps
+        # tutors apart.
+        owner = teacher_id if overdue_only else None
+        students = self.flights.do(
+            ("students_overview", owner, limit, after, overdue_only),
+            lambda: list(
+                self._stream_students_overview(
+                    teacher_id, limit, after, overdue_only, all_tasks=True
+                )
+            ),
+        )
+        return (self._for_teacher(student, teacher_id) for student in students)
 
-        return {"tasks": tasks, "points": student["points"]}
+    def overview_cursor(self, student: dict) -> str:
+        return self.cursors.encode(student["username"], student["id"])
 
-    def list_students(self) -> list[dict]:
+    def _for_teacher(self, student: dict, teacher_id: int) -> dict:
+        tasks = [
+            {key: value for key, value in task.items() if key != "created_by"}
+            for task in student["tasks"]
+            if task["created_by"] in (teacher_id, None)
+        ]
+        return {**student, "tasks": tasks}
+
+    def _shared(self, key: tuple, fn: Callable[[], Any]):
+        if self.flights is None:
+            return fn()
+        return self.flights.do(key, fn)
+
+    def _build_leaderboard(self) -> list[dict]:
+        if self.board is not None:
+            self._ensure_board_loaded()
+            ranked_rows = self.board.rows()
+        else:
+            ranked_rows = self._rank_rows(self._fetch_leaderboard_totals())
+        return self._present_rows(ranked_rows, len(ranked_rows))
+
+    def _ensure_board_loaded(self) -> None:
+        if self.board.is_stale():
+            self.reload_leaderboard()
+
+    def _fetch_leaderboard_totals(self) -> list[dict]:
         conn = get_db()
         cursor = conn.cursor()
         try:
             cursor.execute(
-                "SELECT id, username, email, points FROM users WHERE role = 'student' ORDER BY username"
+                """
+                SELECT id, username, earned_points AS total_points
+                FROM users
+                WHERE role = 'student'
+                ORDER BY earned_points DESC, username ASC
+                """
             )
-            students = cursor.fetchall()
+            return cursor.fetchall()
         finally:
             cursor.close()
             conn.close()
-        return students
 
-    def students_overview(self, teacher_id: int) -> list[dict]:
+    def _fetch_leaderboard_page(
+        self, limit: int, after: Optional[tuple[int, str]]
+    ) -> tuple[list[dict], int]:
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            if after:
+                cursor.execute(
+                    """
+                    SELECT id, username, earned_points AS total_points
+                    FROM users
+                    WHERE role = 'student'
+                      AND (earned_points < %s OR (earned_points = %s AND username > %s))
+                    ORDER BY earned_points DESC, username ASC
+                    LIMIT %s
+                    """,
+                    (after[0], after[0], after[1], limit),
+                )
+            else:
+                cursor.execute(
+                    """
+                    SELECT id, username, earned_points AS total_points
+                    FROM users
+                    WHERE role = 'student'
+                    ORDER BY earned_points DESC, username ASC
+                    LIMIT %s
+                    """,
+                    (limit,),
+                )
+            rows = cursor.fetchall()
+            ranked_rows = self._rank_window(cursor, rows)
+            total_students = self._count_students(cursor)
+        finally:
+            cursor.close()
+            conn.close()
+        return ranked_rows, total_students
+
+    def _fetch_leaderboard_window(
+        self, student_id: int, neighbors: int
+    ) -> tuple[list[dict], int]:
         conn = get_db()
         cursor = conn.cursor()
         try:
             cursor.execute(
-                "SELECT id, username, email, points FROM users WHERE role = 'student' ORDER BY username"
+                """
+                SELECT id, username, earned_points AS total_points
+                FROM users
+                WHERE id = %s AND role = 'student'
+                """,
+                (student_id,),
             )
-            students = cursor.fetchall()
+            me = cursor.fetchone()
+            if not me:
+                return [], 0
 
             cursor.execute(
                 """
-                SELECT a.student_id,
-                       t.id AS task_id,
-                       t.title,
-                       t.deadline,
-                       s.id AS submission_id,
-                       s.submitted_at
-                FROM task_assignments a
-                JOIN tasks t ON t.id = a.task_id
-                LEFT JOIN (
-                    SELECT s1.id, s1.task_id, s1.student_id, s1.submitted_at
-                    FROM submissions s1
-                    JOIN (
-                        SELECT task_id, student_id, MAX(submitted_at) AS latest_submitted_at
-                        FROM submissions
-                        GROUP BY task_id, student_id
-                    ) latest
-                      ON latest.task_id = s1.task_id
-                     AND latest.student_id = s1.student_id
-                     AND latest.latest_submitted_at = s1.submitted_at
-                ) s ON s.task_id = a.task_id AND s.student_id = a.student_id
-                WHERE t.created_by = %s OR t.created_by IS NULL
-                ORDER BY a.student_id, t.deadline IS NULL, t.deadline
+                SELECT id, username, earned_points AS total_points
+                FROM users
+                WHERE role = 'student'
+                  AND (earned_points > %s OR (earned_points = %s AND username < %s))
+                ORDER BY earned_points ASC, username DESC
+                LIMIT %s
                 """,
-                (teacher_id,),
+                (me["total_points"], me["total_points"], me["username"], neighbors),
             )
-            rows = cursor.fetchall()
+            above = list(reversed(cursor.fetchall()))
+            cursor.execute(
+                """
+                SELECT id, username, earned_points AS total_points
+                FROM users
+                WHERE role = 'student'
+                  AND (earned_points < %s OR (earned_points = %s AND username > %s))
+                ORDER BY earned_points DESC, username ASC
+                LIMIT %s
+                """,
+                (me["total_points"], me["total_points"], me["username"], neighbors),
+            )
+            below = cursor.fetchall()
+
+            ranked_rows = self._rank_window(cursor, above + [me] + below)
+            total_students = self._count_students(cursor)
         finally:
             cursor.close()
             conn.close()
+        return ranked_rows, total_students
+
+    def _rank_window(self, cursor, rows: list[dict]) -> list[dict]:
+        # Ranks inside a window come from the students ahead of its first row:
+        # those with more points set the rank, and those tied but sorted
+        # earlier set where the window starts.
+        if not rows:
+            return []
+        first = rows[0]
+        cursor.execute(
+            """
+            SELECT COUNT(*) AS preceding,
+                   CAST(COALESCE(SUM(earned_points > %s), 0) AS SIGNED) AS ahead
+            FROM users
+            WHERE role = 'student'
+              AND (earned_points > %s OR (earned_points = %s AND username < %s))
+            """,
+            (first["total_points"], first["total_points"], first["total_points"], first["username"]),
+        )
+        counts = cursor.fetchone()
+
+        ranked_rows = []
+        current_rank = counts["ahead"] + 1
+        last_points = first["total_points"]
+        for index, row in enumerate(rows):
+            if row["total_points"] != last_points:
+                current_rank = counts["preceding"] + index + 1
+                last_points = row["total_points"]
+            ranked_rows.append({**row, "rank": current_rank})
+        return ranked_rows
 
-        tasks_by_student = {student["id"]: [] for student in students}
-        for row in rows:
-            tasks_by_student.setdefault(row["student_id"], []).append(
-                {
-                    "id": row["task_id"],
-                    "title": row["title"],
-                    "deadline": row["deadline"],
-                    "submitted": row["submission_id"] is not None,
-                    "submitted_at": row["submitted_at"],
-                }
+    def _count_students(self, cursor) -> int:
+        cursor.execute("SELECT COUNT(*) AS total FROM users WHERE role = 'student'")
+        return cursor.fetchone()["total"]
+
+    def _rank_rows(self, rows: list[dict]) -> list[dict]:
+        ranked_rows = []
+        current_rank = 0
+        last_points = None
+        for index, row in enumerate(rows):
+            if last_points is None or row["total_points"] != last_points:
+                current_rank = index + 1
+                last_points = row["total_points"]
+            ranked_rows.append({**row, "rank": current_rank})
+        return ranked_rows
+
+    def _present_rows(self, ranked_rows: list[dict], total_students: int) -> list[dict]:
+        return [
+            {
+                "username": row["username"],
+                "total_points": row["total_points"],
+                "rank": row["rank"],
+                "tier": self._assign_tier(row["rank"], total_students),
+            }
+            for row in ranked_rows
+        ]
+
+    def _stream_students_overview(
+        self,
+        teacher_id: int,
+        limit: Optional[int],
+        after: Optional[tuple[str, int]],
+        overdue_only: bool,
+        all_tasks: bool = False,
+    ) -> Iterator[dict]:
+        # all_tasks: join every tutor's tasks, tagged with created_by, instead
+        # of only teacher_id's.
+        conditions = ["role = 'student'"]
+        params: list = []
+        if after:
+            conditions.append("(username > %s OR (username = %s AND id > %s))")
+            params.extend([after[0], after[0], after[1]])
+        if overdue_only:
+            conditions.append(
+                """
+                EXISTS (
+                    SELECT 1
+                    FROM task_assignments oa
+                    JOIN tasks ot ON ot.id = oa.task_id
+                    WHERE oa.student_id = users.id
+                      AND (ot.created_by = %s OR ot.created_by IS NULL)
+                      AND ot.deadline < %s
+                      AND NOT EXISTS (
+                          SELECT 1
+                          FROM submissions os
+                          WHERE os.student_id = oa.student_id AND os.task_id = oa.task_id
+                      )
+                )
+                """
             )
+            params.extend([teacher_id, self.clock.now_str()])
+        limit_clause = ""
+        if limit is not None:
+            limit_clause = "LIMIT %s"
+            params.append(limit)
+        task_filter = ""
+        if not all_tasks:
+            task_filter = "AND (t.created_by = %s OR t.created_by IS NULL)"
+            params.append(teacher_id)
 
-        overview = []
-        for student in students:
-            overview.append(
-                {
-                    "id": student["id"],
-                    "username": student["username"],
-                    "email": student["email"],
-                    "points": student["points"],
-                    "tasks": tasks_by_student.get(student["id"], []),
-                }
+        conn = get_db(cursorclass=pymysql.cursors.SSDictCursor)
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                f"""
+                SELECT u.id,
+                       u.username,
+                       u.email,
+                       u.points,
+                       t.id AS task_id,
+                       t.title,
+                       t.deadline,
+                       t.created_by,
+                       (
+                           SELECT MAX(s.submitted_at)
+                           FROM submissions s
+                           WHERE s.student_id = u.id AND s.task_id = t.id
+                       ) AS submitted_at
+                FROM (
+                    SELECT id, username, email, points
+                    FROM users
+                    WHERE {" AND ".join(conditions)}
+                    ORDER BY username, id
+                    {limit_clause}
+                ) u
+                LEFT JOIN (
+                    task_assignments a
+                    JOIN tasks t
+                      ON t.id = a.task_id
+                     {task_filter}
+                ) ON a.student_id = u.id
+                ORDER BY u.username, u.id, t.deadline IS NULL, t.deadline
+                """,
+                params,
             )
-        return overview
+
+            student = None
+            for row in cursor:
+                if student is None or student["id"] != row["id"]:
+                    if student is not None:
+                        yield student
+                    student = {
+                        "id": row["id"],
+                        "username": row["username"],
+                        "email": row["email"],
+                        "points": row["points"],
+                        "tasks": [],
+                    }
+                if row["task_id"] is not None:
+                    task = {
+                        "id": row["task_id"],
+                        "title": row["title"],
+                        "deadline": row["deadline"],
+                        "submitted": row["submitted_at"] is not None,
+                        "submitted_at": row["submitted_at"],
+                    }
+                    if all_tasks:
+                        task["created_by"] = row["created_by"]
+                    student["tasks"].append(task)
+            if student is not None:
+                yield student
+        finally:
+            cursor.close()
+            conn.close()
 
     def _assign_tier(self, rank: int, total: int) -> str:
         if total == 0:
@@ -6,10 +6,16 @@ from typing import Optional
 from werkzeug.datastructures import FileStorage
 from werkzeug.utils import secure_filename
 
+from ..cache import QueryCache, StudentProgressCache, reads
 from ..db import get_db
+from ..events import EventBus
+from ..leaderboard import RankedLeaderboard
 from ..models import Submission, Task
 from ..utils.files import generate_pdf_storage_name
+from .change_log_service import ChangeLogService
 from .core import DateTimeParser, LatePenaltyPolicy, ServiceError, TimeProvider
+from .notification_service import NotificationService
+from .score_service import ScoreService
 
 
 class SubmissionService:
@@ -19,11 +25,25 @@ class SubmissionService:
         parser: Optional[DateTimeParser] = None,
         clock: Optional[TimeProvider] = None,
         penalty_policy: Optional[LatePenaltyPolicy] = None,
+        scores: Optional[ScoreService] = None,
+        board: Optional[RankedLeaderboard] = None,
+        progress_cache: Optional[StudentProgressCache] = None,
+        notifications: Optional[NotificationService] = None,
+        events: Optional[EventBus] = None,
+        changes: Optional[ChangeLogService] = None,
+        query_cache: Optional[QueryCache] = None,
     ):
         self.upload_folder = upload_folder
         self.parser = parser or DateTimeParser()
         self.clock = clock or TimeProvider()
         self.penalty_policy = penalty_policy or LatePenaltyPolicy()
+        self.scores = scores or ScoreService()
+        self.board = board
+        self.progress_cache = progress_cache
+        self.notifications = notifications or NotificationService()
+        self.events = events
+        self.changes = changes or ChangeLogService(self.clock)
+        self.query_cache = query_cache
 
     def create_submission(
         self,
@@ -96,18 +116,28 @@ class SubmissionService:
                     None,
                 ),
             )
-            conn.commit()
             submission_id = cursor.lastrowid
+            self.changes.record(cursor, "submission", [int(task_id)], audience_id=student["id"])
+            conn.commit()
         finally:
             cursor.close()
             conn.close()
 
+        self._invalidate_progress(student["id"])
+        self._bump_tables("submissions")
+        self._publish(
+            "submission.created",
+            {"taskId": int(task_id), "submissionId": submission_id},
+            roles=("tutor",),
+        )
+
         return {
             "submissionId": submission_id,
             "maxPoints": max_points,
             "daysLate": days_late,
         }
 
+    @reads("submissions", "tasks", key=lambda student, task_id: (student["id"], task_id))
     def list_my_submissions(self, student: dict, task_id: Optional[str]) -> list[dict]:
         conn = get_db()
         cursor = conn.cursor()
@@ -150,6 +180,7 @@ class SubmissionService:
             cursor.close()
             conn.close()
 
+    @reads("submissions", "tasks", "users")
     def list_task_submissions(self, task_id: int) -> list[dict]:
         conn = get_db()
         cursor = conn.cursor()
@@ -180,6 +211,46 @@ class SubmissionService:
             cursor.close()
             conn.close()
 
+    def submission_groups(self, groups: list[tuple[int, int]]) -> list[dict]:
+        # Current submissions for each (task_id, student_id); an empty list
+        # means the group is gone.
+        if not groups:
+            return []
+        placeholders = ", ".join(["(%s, %s)"] * len(groups))
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                f"""
+                SELECT s.*, u.username, u.email, t.title, t.points, t.deadline
+                FROM submissions s
+                JOIN users u ON u.id = s.student_id
+                JOIN tasks t ON t.id = s.task_id
+                WHERE (s.task_id, s.student_id) IN ({placeholders})
+                ORDER BY s.task_id, s.student_id, s.submitted_at DESC
+                """,
+                [value for group in groups for value in group],
+            )
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+        grouped: dict[tuple[int, int], list[dict]] = {group: [] for group in groups}
+        for row in rows:
+            task = self._task_from_row(row)
+            submission = self._submission_from_row(row)
+            row["max_points"], row["days_late"] = self.penalty_policy.evaluate(
+                task, submission.submitted_at
+            )
+            grouped[(row["task_id"], row["student_id"])].append(row)
+        for submissions in grouped.values():
+            self._add_attempt_numbers(submissions)
+        return [
+            {"taskId": task_id, "studentId": student_id, "submissions": submissions}
+            for (task_id, student_id), submissions in grouped.items()
+        ]
+
     def award_submission(
         self,
         teacher: dict,
@@ -198,7 +269,8 @@ class SubmissionService:
         try:
             cursor.execute(
                 """
-                SELECT s.id, s.task_id, s.student_id, s.awarded_points, s.submitted_at, t.points, t.deadline
+                SELECT s.id, s.task_id, s.student_id, s.awarded_points, s.submitted_at,
+                       t.title, t.points, t.deadline
                 FROM submissions s
                 JOIN tasks t ON t.id = s.task_id
                 WHERE s.id = %s
@@ -265,11 +337,32 @@ class SubmissionService:
                 "UPDATE users SET points = GREATEST(points + %s, 0) WHERE id = %s",
                 (delta, submission.student_id),
             )
+            score_delta = self.scores.refresh(
+                cursor, submission.task_id, submission.student_id
+            )
+            self.notifications.add(
+                cursor,
+                [
+                    self._award_notification(
+                        submission.student_id, submission.task_id, row["title"], awarded_points
+                    )
+                ],
+            )
+            self.changes.record(
+                cursor, "submission", [submission.task_id], audience_id=submission.student_id
+            )
             conn.commit()
         finally:
             cursor.close()
             conn.close()
 
+        self.notifications.invalidate(submission.student_id)
+        self._invalidate_progress(submission.student_id)
+        self._bump_tables("submissions", "users")
+        if self.board is not None:
+            self.board.adjust(submission.student_id, score_delta)
+        self._publish_award(submission.task_id, submission.student_id, score_delta)
+
     def award_task_submissions(
         self,
         task_id: int,
@@ -288,7 +381,7 @@ class SubmissionService:
         try:
             cursor.execute(
                 """
-                SELECT s.id, s.submitted_at, s.awarded_points, t.points, t.deadline
+                SELECT s.id, s.submitted_at, s.awarded_points, t.title, t.points, t.deadline
                 FROM submissions s
                 JOIN tasks t ON t.id = s.task_id
                 WHERE s.task_id = %s AND s.student_id = %s
@@ -331,11 +424,24 @@ class SubmissionService:
                 "UPDATE users SET points = GREATEST(points + %s, 0) WHERE id = %s",
                 (delta, student_id),
             )
+            score_delta = self.scores.refresh(cursor, task_id, student_id)
+            self.notifications.add(
+                cursor,
+                [self._award_notification(student_id, task_id, latest["title"], awarded_points)],
+            )
+            self.changes.record(cursor, "submission", [task_id], audience_id=student_id)
             conn.commit()
         finally:
             cursor.close()
             conn.close()
 
+        self.notifications.invalidate(student_id)
+        self._invalidate_progress(student_id)
+        self._bump_tables("submissions", "users")
+        if self.board is not None:
+            self.board.adjust(student_id, score_delta)
+        self._publish_award(task_id, student_id, score_delta)
+
     def resolve_submission_file_path(self, user: dict, submission_id: int) -> str:
         conn = get_db()
         cursor = conn.cursor()
@@ -384,44 +490,82 @@ class SubmissionService:
 
             resolved_path = self._resolve_pdf_path(submission.get("pdf_path"))
 
+            cursor.execute("DELETE FROM submissions WHERE id = %s", (submission_id,))
+
+            delta = 0
             if submission["awarded_points"] is not None:
-                cursor.execute(
-                    """
-                    SELECT MAX(awarded_points) AS max_points
-                    FROM submissions
-                    WHERE task_id = %s AND student_id = %s AND awarded_points IS NOT NULL
-                    """,
-                    (submission["task_id"], submission["student_id"]),
-                )
-                old_effective = cursor.fetchone()["max_points"] or 0
-                cursor.execute(
-                    """
-                    SELECT MAX(awarded_points) AS max_points
-                    FROM submissions
-                    WHERE task_id = %s AND student_id = %s AND id != %s AND awarded_points IS NOT NULL
-                    """,
-                    (submission["task_id"], submission["student_id"], submission_id),
+                delta = self.scores.refresh(
+                    cursor, submission["task_id"], submission["student_id"]
                 )
-                new_effective = cursor.fetchone()["max_points"] or 0
-                delta = new_effective - old_effective
                 if delta != 0:
                     cursor.execute(
                         "UPDATE users SET points = GREATEST(points + %s, 0) WHERE id = %s",
                         (delta, submission["student_id"]),
                     )
 
-            cursor.execute("DELETE FROM submissions WHERE id = %s", (submission_id,))
+            self.changes.record(
+                cursor, "submission", [submission["task_id"]], audience_id=submission["student_id"]
+            )
             conn.commit()
         finally:
             cursor.close()
             conn.close()
 
+        self._invalidate_progress(submission["student_id"])
+        self._bump_tables("submissions", "users")
+        if self.board is not None:
+            self.board.adjust(submission["student_id"], delta)
+        self._publish(
+            "submission.deleted",
+            {"taskId": submission["task_id"], "submissionId": submission_id},
+            user_ids=[submission["student_id"]],
+            roles=("tutor",),
+        )
+        if delta:
+            self._publish("leaderboard.changed", {})
+
         if resolved_path:
             try:
                 os.remove(resolved_path)
             except OSError:
                 pass
 
+    def _award_notification(
+        self, student_id: int, task_id: int, title: str, awarded_points: int
+    ) -> tuple:
+        return (
+            student_id,
+            "award",
+            f"Points awarded for '{title}'",
+            f"You received {awarded_points} points.",
+            task_id,
+            None,
+        )
+
+    def _publish(self, event: str, data: dict, user_ids=None, roles=None) -> None:
+        if self.events is not None:
+            self.events.publish(event, data, user_ids=user_ids, roles=roles)
+
+    def _publish_award(self, task_id: int, student_id: int, score_delta: int) -> None:
+        # The student's inbox, progress and points all moved; tutors see the
+        # grade land on their submissions view.
+        self._publish(
+            "submission.awarded",
+            {"taskId": task_id, "studentId": student_id},
+            user_ids=[student_id],
+            roles=("tutor",),
+        )
+        if score_delta:
+            self._publish("leaderboard.changed", {})
+
+    def _invalidate_progress(self, student_id: int) -> None:
+        if self.progress_cache is not None:
+            self.progress_cache.invalidate_student(student_id)
+
+    def _bump_tables(self, *tables: str) -> None:
+        if self.query_cache is not None:
+            self.query_cache.bump(*tables)
+
     def _task_from_row(self, row: dict) -> Task:
         deadline_value = row.get("deadline")
         try:
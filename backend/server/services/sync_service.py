@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from .change_log_service import ChangeLogService
+from .shop_service import ShopService
+from .submission_service import SubmissionService
+from .task_service import TaskService
+
+
+class SyncService:
+    # Turns change_log rows since a cursor into the current state of what
+    # changed, shaped like the list endpoints so clients can merge by id.
+    def __init__(
+        self,
+        tasks: TaskService,
+        submissions: SubmissionService,
+        shop: ShopService,
+        changes: Optional[ChangeLogService] = None,
+    ):
+        self.tasks = tasks
+        self.submissions = submissions
+        self.shop = shop
+        self.changes = changes or ChangeLogService()
+
+    def sync(self, user: dict, cursor: Optional[str], limit: int = 500) -> dict:
+        if cursor is None:
+            # No cursor yet: hand out the current position; the client loads
+            # everything once and syncs from here.
+            return self._response(user, self.changes.head(), False)
+
+        since = self.changes.decode(cursor)
+        rows, last_seq, has_more = self.changes.read(user, since, limit)
+
+        # Only the last op per entity matters.
+        latest: dict[tuple, str] = {}
+        for row in rows:
+            latest[(row["entity"], row["entity_id"], row["audience_id"])] = row["op"]
+
+        def ids(entity: str, op: str) -> set:
+            return {key[1] for key, value in latest.items() if key[0] == entity and value == op}
+
+        deleted_tasks = ids("task", "delete")
+        refresh_tasks = ids("task", "upsert")
+        groups = {(key[1], key[2]) for key in latest if key[0] == "submission"}
+        if user["role"] == "student":
+            # A student's task list depends on their assignments and on
+            # whether they have submitted (is_done).
+            refresh_tasks |= ids("assignment", "upsert") | {task_id for task_id, _ in groups}
+            deleted_tasks |= ids("assignment", "delete")
+
+        response = self._response(user, last_seq, has_more)
+        upserted = self.tasks.get_tasks(user, sorted(refresh_tasks - ids("task", "delete")))
+        upserted_ids = {task["id"] for task in upserted}
+        response["tasks"] = {
+            "upserted": upserted,
+            "deleted": sorted(deleted_tasks - upserted_ids),
+        }
+        response["submissions"] = self.submissions.submission_groups(
+            sorted(group for group in groups if group[0] not in deleted_tasks)
+        )
+
+        rewards = self.shop.get_rewards(sorted(ids("reward", "upsert")))
+        reward_ids = {reward["id"] for reward in rewards}
+        response["rewards"] = {
+            "upserted": rewards,
+            "deleted": sorted((ids("reward", "upsert") | ids("reward", "delete")) - reward_ids),
+        }
+
+        if user["role"] == "tutor":
+            assignment_tasks = {key[1] for key in latest if key[0] == "assignment"}
+            assignments = self.tasks.assignments_for(sorted(assignment_tasks - deleted_tasks))
+            response["assignments"] = [
+                {"taskId": task_id, "studentIds": student_ids}
+                for task_id, student_ids in assignments.items()
+            ]
+        return response
+
+    def _response(self, user: dict, seq: int, has_more: bool) -> dict:
+        response = {
+            "cursor": self.changes.encode(seq),
+            "hasMore": has_more,
+            "tasks": {"upserted": [], "deleted": []},
+            "submissions": [],
+            "rewards": {"upserted": [], "deleted": []},
+        }
+        if user["role"] == "tutor":
+            response["assignments"] = []
+        return response
@@ -6,10 +6,16 @@ from typing import Iterable, Optional
 
 from werkzeug.datastructures import FileStorage
 
+from ..cache import QueryCache, StudentProgressCache, reads, validated_version
 from ..db import get_db
+from ..events import EventBus
+from ..leaderboard import RankedLeaderboard
 from ..models import Task, Submission
 from ..utils.files import generate_pdf_storage_name
+from .change_log_service import ChangeLogService
 from .core import DateTimeParser, LatePenaltyPolicy, ServiceError, TimeProvider
+from .reminder_service import ReminderService
+from .score_service import ScoreService
 
 
 class TaskService:
@@ -19,50 +25,98 @@ class TaskService:
         parser: Optional[DateTimeParser] = None,
         clock: Optional[TimeProvider] = None,
         penalty_policy: Optional[LatePenaltyPolicy] = None,
+        scores: Optional[ScoreService] = None,
+        board: Optional[RankedLeaderboard] = None,
+        progress_cache: Optional[StudentProgressCache] = None,
+        reminders: Optional[ReminderService] = None,
+        events: Optional[EventBus] = None,
+        changes: Optional[ChangeLogService] = None,
+        query_cache: Optional[QueryCache] = None,
     ):
         self.upload_folder = upload_folder
         self.parser = parser or DateTimeParser()
         self.clock = clock or TimeProvider()
         self.penalty_policy = penalty_policy or LatePenaltyPolicy()
-
+        self.scores = scores or ScoreService()
+        self.board = board
+        self.progress_cache = progress_cache
+        self.reminders = reminders or ReminderService(self.clock)
+        self.events = events
+        self.changes = changes or ChangeLogService(self.clock)
+        self.query_cache = query_cache
+
+    @reads("tasks", "task_assignments", "submissions", key=lambda user: (user["id"], user["role"]))
     def list_tasks(self, user: dict) -> list[dict]:
+        # The cached list remembers the change_log version it was built under;
+        # behind an ETag only a list built under the same version is reused.
+        cache_key = None
+        version = validated_version()
+        if user["role"] == "student" and self.progress_cache is not None:
+            cache_key = self.progress_cache.tasks_key(user["id"])
+            cached = self.progress_cache.get(cache_key)
+            if cached is not None and (version is None or cached[0] == version):
+                return cached[1]
+
+        tasks = self._fetch_tasks(user)
+        if cache_key is not None:
+            self.progress_cache.set(cache_key, (version, tasks))
+        return tasks
+
+    def get_tasks(self, user: dict, task_ids: list[int]) -> list[dict]:
+        # The listed tasks as list_tasks would show them to this user; ids the
+        # user cannot see are left out.
+        if not task_ids:
+            return []
+        return self._fetch_tasks(user, task_ids)
+
+    def _fetch_tasks(self, user: dict, task_ids: Optional[list[int]] = None) -> list[dict]:
+        id_filter = ""
+        params: list = []
+        if task_ids is not None:
+            placeholders = ", ".join(["%s"] * len(task_ids))
+            id_filter = f"AND t.id IN ({placeholders})"
+            params = list(task_ids)
+
         conn = get_db()
         cursor = conn.cursor()
         tasks: list[dict] = []
         try:
             if user["role"] == "student":
                 cursor.execute(
-                    """
-                    SELECT t.id, t.title, t.description, t.deadline, t.points, t.created_by, t.pdf_path
+                    f"""
+                    SELECT t.id, t.title, t.description, t.deadline, t.points, t.created_by, t.pdf_path,
+                           EXISTS (
+                               SELECT 1
+                               FROM submissions s
+                               WHERE s.student_id = a.student_id AND s.task_id = a.task_id
+                           ) AS is_done
                     FROM tasks t
                     JOIN task_assignments a ON a.task_id = t.id
-                    WHERE a.student_id = %s
+                    WHERE a.student_id = %s {id_filter}
                     ORDER BY t.deadline IS NULL, t.deadline
                     """,
-                    (user["id"],),
-                )
-                rows = cursor.fetchall()
-                cursor.execute(
-                    "SELECT DISTINCT task_id FROM submissions WHERE student_id = %s",
-                    (user["id"],),
+                    [user["id"], *params],
                 )
-                submitted = {row["task_id"] for row in cursor.fetchall()}
             else:
                 cursor.execute(
-                    "SELECT id, title, description, deadline, points, created_by, pdf_path FROM tasks ORDER BY deadline IS NULL, deadline"
+                    f"""
+                    SELECT t.id, t.title, t.description, t.deadline, t.points, t.created_by, t.pdf_path
+                    FROM tasks t
+                    WHERE 1 = 1 {id_filter}
+                    ORDER BY t.deadline IS NULL, t.deadline
+                    """,
+                    params,
                 )
-                rows = cursor.fetchall()
-                submitted = set()
+            rows = cursor.fetchall()
 
             for row in rows:
                 task = self._task_from_row(row)
                 task_data = self._task_to_dict(task)
-                task_data["is_done"] = task.id in submitted
+                task_data["is_done"] = bool(row.get("is_done"))
                 tasks.append(task_data)
         finally:
             cursor.close()
             conn.close()
-
         return tasks
 
     def create_task(
@@ -123,25 +177,45 @@ class TaskService:
                 """,
                 (title, description, deadline_value, points_value, teacher["id"], pdf_path),
             )
-            conn.commit()
             task_id = cursor.lastrowid
+            self.reminders.schedule(cursor, task_id, deadline_value)
+            self.changes.record(cursor, "task", [task_id])
+            conn.commit()
         finally:
             cursor.close()
 
         self._replace_task_assignments(conn, task_id, assigned_student_ids, teacher["id"])
         conn.close()
+        self._invalidate_progress()
+        self._bump_tables("tasks", "task_assignments")
+        self._publish("task.updated", {"taskId": task_id})
 
     def delete_task(self, task_id: int) -> bool:
         conn = get_db()
         cursor = conn.cursor()
         try:
+            self.scores.forget_task(cursor, task_id)
             cursor.execute("DELETE FROM tasks WHERE id = %s", (task_id,))
+            deleted = cursor.rowcount > 0
+            if deleted:
+                self.changes.record(cursor, "task", [task_id], op="delete")
             conn.commit()
-            return cursor.rowcount > 0
         finally:
             cursor.close()
             conn.close()
 
+        if deleted:
+            self._invalidate_progress()
+            self._bump_tables("tasks", "task_assignments", "submissions", "users")
+        # Totals move for every student who had a score on the task; reload
+        # rather than tracking each delta.
+        if deleted and self.board is not None:
+            self.board.invalidate()
+        if deleted:
+            self._publish("task.deleted", {"taskId": task_id})
+            self._publish("leaderboard.changed", {})
+        return deleted
+
     def update_task(self, task_id: int, data: dict, teacher: dict) -> None:
         title = data.get("title")
         description = data.get("description")
@@ -153,6 +227,7 @@ class TaskService:
             if assigned_student_ids is None or len(assigned_student_ids) == 0:
                 raise ServiceError("Select at least one student.")
 
+        score_deltas: dict[int, int] = {}
         conn = get_db()
         cursor = conn.cursor()
         try:
@@ -198,6 +273,9 @@ class TaskService:
                     task_id,
                 ),
             )
+            if deadline_value is not None:
+                self.reminders.schedule(cursor, task_id, deadline_value)
+            self.changes.record(cursor, "task", [task_id])
             conn.commit()
 
             if assigned_student_ids is not None:
@@ -219,6 +297,7 @@ class TaskService:
                     (task_id,),
                 )
                 submissions = cursor.fetchall()
+                penalized_students = set()
                 for submission_row in submissions:
                     submission = self._submission_from_row(submission_row)
                     new_max, _ = self.penalty_policy.evaluate(
@@ -235,11 +314,26 @@ class TaskService:
                             "UPDATE users SET points = GREATEST(points + %s, 0) WHERE id = %s",
                             (delta, submission.student_id),
                         )
+                        penalized_students.add(submission.student_id)
+                for student_id in penalized_students:
+                    score_deltas[student_id] = self.scores.refresh(cursor, task_id, student_id)
+                for student_id in penalized_students:
+                    self.changes.record(cursor, "submission", [task_id], audience_id=student_id)
                 conn.commit()
         finally:
             cursor.close()
             conn.close()
 
+        self._invalidate_progress()
+        self._bump_tables("tasks", "task_assignments", "submissions", "users")
+        if self.board is not None:
+            for student_id, delta in score_deltas.items():
+                self.board.adjust(student_id, delta)
+        self._publish("task.updated", {"taskId": task_id})
+        if any(score_deltas.values()):
+            self._publish("leaderboard.changed", {})
+
+    @reads("tasks", "task_assignments")
     def get_task_assignments(self, task_id: int) -> list[int]:
         conn = get_db()
         cursor = conn.cursor()
@@ -259,6 +353,32 @@ class TaskService:
             cursor.close()
             conn.close()
 
+    def assignments_for(self, task_ids: list[int]) -> dict[int, list[int]]:
+        if not task_ids:
+            return {}
+        placeholders = ", ".join(["%s"] * len(task_ids))
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                f"""
+                SELECT task_id, student_id
+                FROM task_assignments
+                WHERE task_id IN ({placeholders})
+                ORDER BY task_id, student_id
+                """,
+                list(task_ids),
+            )
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+        assignments: dict[int, list[int]] = {task_id: [] for task_id in task_ids}
+        for row in rows:
+            assignments[row["task_id"]].append(row["student_id"])
+        return assignments
+
     def resolve_task_file_path(self, task_id: int, user: dict) -> str:
         conn = get_db()
         cursor = conn.cursor()
@@ -285,6 +405,19 @@ class TaskService:
             cursor.close()
             conn.close()
 
+    def _publish(self, event: str, data: dict, user_ids=None, roles=None) -> None:
+        if self.events is not None:
+            self.events.publish(event, data, user_ids=user_ids, roles=roles)
+
+    def _invalidate_progress(self) -> None:
+        # Task edits touch every assigned student, so drop all cached progress.
+        if self.progress_cache is not None:
+            self.progress_cache.clear()
+
+    def _bump_tables(self, *tables: str) -> None:
+        if self.query_cache is not None:
+            self.query_cache.bump(*tables)
+
     def _task_from_row(self, row: dict) -> Task:
         deadline_value = row.get("deadline")
         try:
@@ -370,6 +503,8 @@ class TaskService:
         self, conn, task_id: int, student_ids: list[int], teacher_id: int
     ) -> None:
         cursor = conn.cursor()
+        cursor.execute("SELECT student_id FROM task_assignments WHERE task_id = %s", (task_id,))
+        previous = {row["student_id"] for row in cursor.fetchall()}
         cursor.execute("DELETE FROM task_assignments WHERE task_id = %s", (task_id,))
         if student_ids:
             rows = [(task_id, student_id, teacher_id) for student_id in student_ids]
@@ -380,6 +515,10 @@ class TaskService:
                 """,
                 rows,
             )
+        for student_id in previous - set(student_ids):
+            self.changes.record(cursor, "assignment", [task_id], op="delete", audience_id=student_id)
+        for student_id in set(student_ids) - previous:
+            self.changes.record(cursor, "assignment", [task_id], audience_id=student_id)
         conn.commit()
         cursor.close()
 
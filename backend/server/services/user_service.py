@@ -2,14 +2,26 @@ from __future__ import annotations
 
 from typing import Optional
 
+from ..cache import QueryCache
 from ..db import get_db
+from ..leaderboard import RankedLeaderboard
 from ..models import User
+from .change_log_service import ChangeLogService
 from .core import ServiceError
 
 
 class UserService:
-    def __init__(self, bcrypt):
+    def __init__(
+        self,
+        bcrypt,
+        board: Optional[RankedLeaderboard] = None,
+        query_cache: Optional[QueryCache] = None,
+        changes: Optional[ChangeLogService] = None,
+    ):
         self.bcrypt = bcrypt
+        self.board = board
+        self.query_cache = query_cache
+        self.changes = changes or ChangeLogService()
 
     def get_by_username(self, username: str) -> Optional[User]:
         conn = get_db()
@@ -74,10 +86,15 @@ class UserService:
                 (username, email, hashed_password, "student"),
             )
             conn.commit()
+            user_id = cursor.lastrowid
         finally:
             cursor.close()
             conn.close()
 
+        self._bump_tables("users")
+        if self.board is not None:
+            self.board.upsert(user_id, username, 0)
+
     def update_user(self, user_id: int, updates: dict) -> None:
         username = updates.get("username")
         email = updates.get("email")
@@ -145,17 +162,78 @@ class UserService:
             cursor.close()
             conn.close()
 
+        self._bump_tables("users")
+        if username and self.board is not None:
+            self.board.rename(user_id, username)
+
     def delete_user(self, user_id: int) -> bool:
         conn = get_db()
         cursor = conn.cursor()
         try:
+            # The foreign keys remove or null out the user's rows without
+            # change_log entries, so collect (and lock) what they will touch:
+            # the user's assignments and submissions, assignments and rewards
+            # a tutor made, and purchases of the user or of those rewards.
+            cursor.execute(
+                """
+                SELECT task_id, student_id FROM task_assignments
+                WHERE student_id = %s OR assigned_by = %s
+                FOR UPDATE
+                """,
+                (user_id, user_id),
+            )
+            assignments = [(row["task_id"], row["student_id"]) for row in cursor.fetchall()]
+            cursor.execute(
+                "SELECT DISTINCT task_id FROM submissions WHERE student_id = %s FOR UPDATE",
+                (user_id,),
+            )
+            submitted = [row["task_id"] for row in cursor.fetchall()]
+            cursor.execute("SELECT id FROM rewards WHERE created_by = %s FOR UPDATE", (user_id,))
+            reward_ids = [row["id"] for row in cursor.fetchall()]
+            cursor.execute(
+                """
+                SELECT p.id, p.student_id
+                FROM purchases p
+                LEFT JOIN rewards r ON r.id = p.reward_id
+                WHERE p.student_id = %s OR r.created_by = %s
+                FOR UPDATE
+                """,
+                (user_id, user_id),
+            )
+            purchases = [(row["id"], row["student_id"]) for row in cursor.fetchall()]
+
             cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
+            deleted = cursor.rowcount > 0
+            if deleted:
+                self.changes.record_rows(cursor, "assignment", assignments, op="delete")
+                self.changes.record(cursor, "submission", submitted, audience_id=user_id)
+                self.changes.record(cursor, "reward", reward_ids, op="delete")
+                self.changes.record_rows(cursor, "purchase", purchases)
             conn.commit()
-            return cursor.rowcount > 0
+        except Exception:
+            conn.rollback()
+            raise
         finally:
             cursor.close()
             conn.close()
 
+        if deleted:
+            # Foreign keys cascade or null out every row that references the user.
+            self._bump_tables(
+                "users",
+                "task_assignments",
+                "submissions",
+                "rewards",
+                "reward_purchase_ledger",
+            )
+        if deleted and self.board is not None:
+            self.board.remove(user_id)
+        return deleted
+
+    def _bump_tables(self, *tables: str) -> None:
+        if self.query_cache is not None:
+            self.query_cache.bump(*tables)
+
     def _user_from_row(self, row: dict) -> User:
         return User(
             id=row.get("id") or 0,
@@ -1,5 +1,5 @@
 import jwt
-from flask import current_app, request
+from flask import current_app, g, request
 
 from ..db import get_db
 
@@ -13,6 +13,13 @@ def decode_token(token: str):
 
 
 def get_current_user():
+    # Looked up once per request; composite endpoints call this per section.
+    if "current_user" not in g:
+        g.current_user = _load_current_user()
+    return g.current_user
+
+
+def _load_current_user():
     token = request.cookies.get(current_app.config["JWT_COOKIE_NAME"])
     if not token:
         return None
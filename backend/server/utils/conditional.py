@@ -0,0 +1,75 @@
+import hashlib
+from functools import wraps
+
+from flask import current_app, g, request
+
+from ..services import ChangeLogService, TimeProvider
+from .auth import get_current_user
+
+
+def changed(*entities):
+    # Validator for responses built only from rows that change_log tracks.
+    def validator(**_view_args):
+        changes = ChangeLogService(TimeProvider(current_app.config.get("KST_OFFSET_HOURS", 9)))
+        return changes.version(*entities)
+
+    return validator
+
+
+def conditional(validator, role=None):
+    # Opt-in ETag / Last-Modified for a GET view. validator(**view_args) runs
+    # before the view and returns (version, last_modified) from cheap queries,
+    # or None when it cannot vouch for the data (the view then runs as usual,
+    # without validators). A match answers 304 without running the view, so
+    # role must name the role the view requires: anyone else goes straight
+    # to the view and its own rejection.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**view_args):
+            user = get_current_user()
+            allowed = user is not None and (role is None or user["role"] == role)
+            validated = validator(**view_args) if allowed else None
+            if validated is None:
+                return view(**view_args)
+
+            version, last_modified = validated
+            etag = _etag(user, version)
+            if _not_modified(etag, last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                # Cached reads under the view key on this version (see reads).
+                g.validated_version = version
+                try:
+                    response = current_app.make_response(view(**view_args))
+                finally:
+                    g.pop("validated_version", None)
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # Bodies are per user, so only the browser may keep them, keyed on
+            # the login cookie, and it must revalidate each time.
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            response.vary.add("Cookie")
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def _etag(user: dict, version) -> str:
+    query = "&".join(f"{key}={value}" for key, value in sorted(request.args.items(multi=True)))
+    raw = f"{request.path}?{query}|{user['id']}|{user['role']}|{version}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+
+
+def _not_modified(etag: str, last_modified) -> bool:
+    # If-None-Match wins over If-Modified-Since when both are sent.
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since is not None and last_modified is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
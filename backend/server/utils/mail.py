@@ -0,0 +1,130 @@
+import smtplib
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from email.mime.text import MIMEText
+from typing import Optional
+
+
+# Server replies in the 4xx range are temporary, so the message is retried.
+# 5xx replies (bad address, rejected content) are not.
+def _is_transient(exc: Exception) -> bool:
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in exc.recipients.values())
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return 400 <= exc.smtp_code < 500
+    return isinstance(exc, (smtplib.SMTPServerDisconnected, OSError))
+
+
+class MailDispatcher:
+    # Sends through a fixed pool of worker threads. Each worker keeps one
+    # logged-in SMTP session open and reuses it for every message it sends.
+    # A failed session is dropped, and the retry opens a new one.
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        sender: str,
+        user: str = "",
+        password: str = "",
+        starttls: bool = True,
+        workers: int = 4,
+        max_attempts: int = 3,
+        backoff_seconds: float = 1.0,
+        timeout: float = 30,
+    ):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mail")
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sessions: list[smtplib.SMTP] = []
+
+    @classmethod
+    def from_config(cls, config, **overrides) -> "MailDispatcher":
+        options = {
+            "host": config["SMTP_HOST"],
+            "port": config["SMTP_PORT"],
+            "sender": config["SMTP_SENDER"],
+            "user": config["SMTP_USER"],
+            "password": config["SMTP_PASSWORD"],
+            "starttls": config["SMTP_STARTTLS"],
+            "workers": config["SMTP_POOL_SIZE"],
+            "max_attempts": config["SMTP_MAX_ATTEMPTS"],
+        }
+        options.update(overrides)
+        return cls(**options)
+
+    def submit(self, to_address: str, subject: str, body: str) -> Future:
+        return self._executor.submit(self.send, to_address, subject, body)
+
+    def send(self, to_address: str, subject: str, body: str) -> None:
+        message = MIMEText(body)
+        message["Subject"] = subject
+        message["From"] = self.sender
+        message["To"] = to_address
+        payload = message.as_string()
+
+        attempt = 1
+        while True:
+            try:
+                self._session().sendmail(self.sender, [to_address], payload)
+                return
+            except Exception as exc:
+                self._drop_session()
+                if attempt >= self.max_attempts or not _is_transient(exc):
+                    raise
+                time.sleep(self.backoff_seconds * 2 ** (attempt - 1))
+                attempt += 1
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            try:
+                session.quit()
+            except (smtplib.SMTPException, OSError):
+                session.close()
+
+    def __enter__(self) -> "MailDispatcher":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _session(self) -> smtplib.SMTP:
+        session: Optional[smtplib.SMTP] = getattr(self._local, "session", None)
+        if session is not None:
+            return session
+
+        session = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                session.starttls()
+            if self.user:
+                session.login(self.user, self.password)
+        except Exception:
+            session.close()
+            raise
+        self._local.session = session
+        with self._lock:
+            self._sessions.append(session)
+        return session
+
+    def _drop_session(self) -> None:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            return
+        self._local.session = None
+        with self._lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+        session.close()
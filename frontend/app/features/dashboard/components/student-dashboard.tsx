@@ -1,4 +1,4 @@
-import { useCallback, useEffect, useMemo, useState } from "react"
+import { useCallback, useEffect, useMemo, useRef, useState } from "react"
 
 import { Button } from "~/components/ui/button"
 import {
@@ -12,6 +12,8 @@ import { Input } from "~/components/ui/input"
 import { Label } from "~/components/ui/label"
 import { Textarea } from "~/components/ui/textarea"
 import { API_BASE_URL, api, getApiErrorMessage } from "~/lib/api"
+import { useServerEvents } from "~/lib/events"
+import { fetchSyncCursor, isSyncExpired, mergeById, type SyncResponse } from "~/lib/sync"
 import type { User } from "~/features/auth/types"
 import type { LeaderboardRow, Purchase, Reward, Submission, Task } from "../types"
 import { formatDeadline, getCountdown } from "../utils"
@@ -21,6 +23,14 @@ type Props = {
   onPointsUpdate: (points: number) => void
 }
 
+// Same order as GET /tasks: by deadline, undated last.
+function sortByDeadline(tasks: Task[]) {
+  return [...tasks].sort((a, b) => {
+    if (!a.deadline || !b.deadline) return a.deadline ? -1 : b.deadline ? 1 : 0
+    return a.deadline.localeCompare(b.deadline)
+  })
+}
+
 type SubmissionDraft = {
   textContent: string
   file: File | null
@@ -190,6 +200,74 @@ export function StudentDashboard({ user, onPointsUpdate }: Props) {
     }
   }, [onPointsUpdate])
 
+  const syncCursor = useRef<string | null>(null)
+
+  const loadDashboard = useCallback(async () => {
+    setLoadingTasks(true)
+    try {
+      syncCursor.current = await fetchSyncCursor().catch(() => null)
+      const { data } = await api.get<{
+        tasks: { tasks: Task[] }
+        leaderboard: { leaderboard: LeaderboardRow[] }
+        rewards: { rewards: Reward[] }
+        purchases: { purchases: Purchase[] }
+        progress: { success: boolean; points?: number }
+      }>("/dashboard/student", {
+        params: { include: "tasks,leaderboard,rewards,purchases,progress" },
+      })
+      setTasks(data.tasks?.tasks || [])
+      setLeaderboard(data.leaderboard?.leaderboard || [])
+      setRewards(data.rewards?.rewards || [])
+      setPurchases(data.purchases?.purchases || [])
+      if (data.progress?.success && typeof data.progress.points === "number") {
+        onPointsUpdate(data.progress.points)
+      }
+    } catch (error) {
+      setStatusMessage(getApiErrorMessage(error, "Failed to load dashboard."))
+    } finally {
+      setLoadingTasks(false)
+    }
+  }, [onPointsUpdate])
+
+  // Pulls only what changed since the last sync and merges it into state.
+  const runSync = useCallback(async () => {
+    if (!syncCursor.current) return
+    try {
+      let hasMore = true
+      while (hasMore && syncCursor.current) {
+        const { data } = await api.get<SyncResponse<Task, Submission, Reward>>("/sync", {
+          params: { since: syncCursor.current },
+        })
+        syncCursor.current = data.cursor
+        hasMore = data.hasMore
+        setTasks((prev) => sortByDeadline(mergeById(prev, data.tasks)))
+        setRewards((prev) => mergeById(prev, data.rewards))
+        if (data.submissions.length > 0) {
+          setSubmissions((prev) => {
+            const next = { ...prev }
+            data.submissions.forEach((group) => {
+              next[group.taskId] = group.submissions
+            })
+            return next
+          })
+          setSubmissionStatus((prev) => {
+            const next = { ...prev }
+            data.submissions.forEach((group) => {
+              next[group.taskId] = group.submissions.length > 0 ? "some" : "none"
+            })
+            return next
+          })
+        }
+      }
+    } catch (error) {
+      if (isSyncExpired(error)) {
+        loadDashboard()
+        return
+      }
+      setStatusMessage(getApiErrorMessage(error, "Failed to refresh dashboard."))
+    }
+  }, [loadDashboard])
+
   const handleToggleSubmissions = (taskId: number) => {
     setExpandedTasks((prev) => {
       const next = { ...prev, [taskId]: !prev[taskId] }
@@ -298,12 +376,20 @@ export function StudentDashboard({ user, onPointsUpdate }: Props) {
   }, [selectedTaskId, submissions])
 
   useEffect(() => {
-    fetchTasks()
-    fetchLeaderboard()
-    fetchRewards()
-    fetchPurchases()
-    refreshUserPoints()
-  }, [fetchLeaderboard, fetchPurchases, fetchRewards, fetchTasks, refreshUserPoints])
+    loadDashboard()
+  }, [loadDashboard])
+
+  useServerEvents({
+    "task.updated": () => runSync(),
+    "task.deleted": () => runSync(),
+    "submission.awarded": () => {
+      runSync()
+      refreshUserPoints()
+    },
+    "leaderboard.changed": () => fetchLeaderboard(),
+    "reward.changed": () => runSync(),
+    resync: () => loadDashboard(),
+  })
 
   useEffect(() => {
     if (selectedTaskId === null) return
@@ -12,6 +12,7 @@ import { Input } from "~/components/ui/input"
 import { Label } from "~/components/ui/label"
 import { Textarea } from "~/components/ui/textarea"
 import { API_BASE_URL, api, getApiErrorMessage } from "~/lib/api"
+import { useServerEvents } from "~/lib/events"
 import type { User } from "~/features/auth/types"
 import type { Purchase, Reward, StudentOverview, Submission, Task } from "../types"
 import { formatDeadline, toDatetimeLocal } from "../utils"
@@ -20,6 +21,8 @@ type Props = {
   user: User
 }
 
+const PURCHASES_PAGE_SIZE = 50
+
 type TaskDraft = {
   title: string
   description: string
@@ -67,6 +70,7 @@ export function TutorDashboard({ user }: Props) {
   })
   const [rewards, setRewards] = useState<Reward[]>([])
   const [rewardPurchases, setRewardPurchases] = useState<Purchase[]>([])
+  const [purchasesCursor, setPurchasesCursor] = useState<string | null>(null)
   const [rewardEdits, setRewardEdits] = useState<
     Record<number, { title: string; description: string; cost: string }>
   >({})
@@ -119,10 +123,16 @@ export function TutorDashboard({ user }: Props) {
     }
   }, [])
 
-  const fetchRewardPurchases = useCallback(async () => {
+  // Newest page first; older pages are appended by "Load more".
+  const fetchRewardPurchases = useCallback(async (cursor?: string) => {
     try {
-      const { data } = await api.get<{ purchases: Purchase[] }>("/purchases/all")
-      setRewardPurchases(data.purchases || [])
+      const { data } = await api.get<{ purchases: Purchase[]; nextCursor: string | null }>(
+        "/purchases/all",
+        { params: { limit: PURCHASES_PAGE_SIZE, ...(cursor ? { cursor } : {}) } }
+      )
+      const page = data.purchases || []
+      setRewardPurchases((prev) => (cursor ? [...prev, ...page] : page))
+      setPurchasesCursor(data.nextCursor || null)
     } catch (error) {
       setStatusMessage(getApiErrorMessage(error, "Failed to load purchases."))
     }
@@ -139,7 +149,16 @@ export function TutorDashboard({ user }: Props) {
 
   const fetchStudentOverview = useCallback(async () => {
     try {
-      const { data } = await api.get<{ students: StudentOverview[] }>("/students/overview")
+      const { data } = await api.get<{
+        students: StudentOverview[]
+        success?: boolean
+        message?: string
+      }>("/students/overview")
+      // The list is streamed, so a failure halfway still comes back as 200.
+      if (data.success === false) {
+        setStatusMessage(data.message || "Failed to load student overview.")
+        return
+      }
       setStudentOverview(data.students || [])
     } catch (error) {
       setStatusMessage(getApiErrorMessage(error, "Failed to load student overview."))
@@ -329,6 +348,31 @@ export function TutorDashboard({ user }: Props) {
     fetchRewardPurchases()
   }, [fetchRewardPurchases, fetchRewards, fetchStudentOverview, fetchStudents, fetchTasks])
 
+  // Only submissions lists that are already open are refetched.
+  const refreshOpenSubmissions = (data: Record<string, unknown>) => {
+    const taskId = Number(data.taskId)
+    if (submissions[taskId]) fetchSubmissions(taskId)
+    fetchStudentOverview()
+  }
+
+  useServerEvents({
+    "task.updated": () => fetchTasks(),
+    "task.deleted": () => fetchTasks(),
+    "submission.created": refreshOpenSubmissions,
+    "submission.deleted": refreshOpenSubmissions,
+    "submission.awarded": refreshOpenSubmissions,
+    "reward.changed": () => {
+      fetchRewards()
+      fetchRewardPurchases()
+    },
+    resync: () => {
+      fetchTasks()
+      fetchRewards()
+      fetchStudentOverview()
+      fetchRewardPurchases()
+    },
+  })
+
   const toggleDraftStudent = (studentId: number) => {
     setTaskDraft((prev) => {
       const next = prev.assignedStudentIds.includes(studentId)
@@ -1114,6 +1158,13 @@ export function TutorDashboard({ user }: Props) {
             </div>
           )}
         </CardContent>
+        {purchasesCursor ? (
+          <CardFooter>
+            <Button variant="outline" onClick={() => fetchRewardPurchases(purchasesCursor)}>
+              Load more
+            </Button>
+          </CardFooter>
+        ) : null}
       </Card>
     </div>
   )
@@ -0,0 +1,37 @@
+import { useEffect, useRef } from "react"
+
+import { API_BASE_URL } from "./api"
+
+export type ServerEventHandlers = Record<string, (data: Record<string, unknown>) => void>
+
+// Subscribes to the backend's /events stream while the component is mounted.
+// Handlers are read through a ref so re-renders don't reopen the stream.
+export function useServerEvents(handlers: ServerEventHandlers) {
+  const handlersRef = useRef(handlers)
+  handlersRef.current = handlers
+
+  useEffect(() => {
+    if (typeof EventSource === "undefined") return
+
+    const source = new EventSource(`${API_BASE_URL}/events`, { withCredentials: true })
+    const names = Object.keys(handlersRef.current)
+    const listeners = names.map((name) => {
+      const listener = (event: MessageEvent) => {
+        let data: Record<string, unknown> = {}
+        try {
+          data = JSON.parse(event.data)
+        } catch {
+          // keep empty
+        }
+        handlersRef.current[name]?.(data)
+      }
+      source.addEventListener(name, listener)
+      return [name, listener] as const
+    })
+
+    return () => {
+      listeners.forEach(([name, listener]) => source.removeEventListener(name, listener))
+      source.close()
+    }
+  }, [])
+}
@@ -0,0 +1,43 @@
+import axios from "axios"
+
+import { api } from "./api"
+
+export type SyncChanges<T> = {
+  upserted: T[]
+  deleted: number[]
+}
+
+export type SyncResponse<TTask, TSubmission, TReward> = {
+  cursor: string
+  hasMore: boolean
+  tasks: SyncChanges<TTask>
+  submissions: Array<{ taskId: number; studentId: number; submissions: TSubmission[] }>
+  rewards: SyncChanges<TReward>
+  assignments?: Array<{ taskId: number; studentIds: number[] }>
+}
+
+// Current /sync position; call before a full load so nothing in between is lost.
+export async function fetchSyncCursor() {
+  const { data } = await api.get<{ cursor: string }>("/sync")
+  return data.cursor
+}
+
+// The server pruned past our cursor; the caller reloads everything.
+export function isSyncExpired(error: unknown) {
+  return axios.isAxiosError(error) && error.response?.status === 410
+}
+
+// Changed rows replace their old copy in place, new rows go first.
+export function mergeById<T extends { id: number }>(current: T[], changes: SyncChanges<T>) {
+  if (changes.upserted.length === 0 && changes.deleted.length === 0) return current
+  const deleted = new Set(changes.deleted)
+  const upserted = new Map(changes.upserted.map((row) => [row.id, row]))
+  const merged = current
+    .filter((row) => !deleted.has(row.id))
+    .map((row) => {
+      const next = upserted.get(row.id)
+      if (next) upserted.delete(row.id)
+      return next ?? row
+    })
+  return [...upserted.values(), ...merged]
+}
@@ -15,6 +15,100 @@
 /*!40101 SET @OLD_SQL_MODE=@@SQL_MODE, SQL_MODE='NO_AUTO_VALUE_ON_ZERO' */;
 /*!40111 SET @OLD_SQL_NOTES=@@SQL_NOTES, SQL_NOTES=0 */;
 
+--
+-- Table structure for table `change_log`
+--
+
+DROP TABLE IF EXISTS `change_log`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `change_log` (
+  `seq` bigint NOT NULL AUTO_INCREMENT,
+  `entity` enum('task','assignment','submission','reward','purchase') NOT NULL,
+  `entity_id` int NOT NULL,
+  `op` enum('upsert','delete') NOT NULL DEFAULT 'upsert',
+  `audience_id` int DEFAULT NULL,
+  `changed_at` datetime NOT NULL,
+  PRIMARY KEY (`seq`),
+  KEY `idx_change_log_entity` (`entity`,`seq`),
+  KEY `idx_change_log_changed_at` (`changed_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `notification_cursors`
+--
+
+DROP TABLE IF EXISTS `notification_cursors`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `notification_cursors` (
+  `user_id` int NOT NULL,
+  `last_seen_id` int NOT NULL DEFAULT '0',
+  `updated_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`user_id`),
+  CONSTRAINT `fk_notification_cursors_user` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `notification_outbox`
+--
+
+DROP TABLE IF EXISTS `notification_outbox`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `notification_outbox` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `task_id` int NOT NULL,
+  `student_id` int NOT NULL,
+  `reminder_type` enum('24h','12h') NOT NULL,
+  `to_address` varchar(255) NOT NULL,
+  `subject` varchar(255) NOT NULL,
+  `body` text NOT NULL,
+  `digest_id` char(32) DEFAULT NULL,
+  `status` enum('pending','sending','sent','dead') NOT NULL DEFAULT 'pending',
+  `attempts` int NOT NULL DEFAULT '0',
+  `available_at` datetime NOT NULL,
+  `lease_token` char(32) DEFAULT NULL,
+  `last_error` text,
+  `sent_at` datetime DEFAULT NULL,
+  `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uniq_outbox_reminder` (`task_id`,`student_id`,`reminder_type`),
+  KEY `idx_outbox_due` (`status`,`available_at`),
+  KEY `idx_outbox_digest` (`digest_id`),
+  KEY `fk_outbox_student` (`student_id`),
+  CONSTRAINT `fk_outbox_student` FOREIGN KEY (`student_id`) REFERENCES `users` (`id`) ON DELETE CASCADE,
+  CONSTRAINT `fk_outbox_task` FOREIGN KEY (`task_id`) REFERENCES `tasks` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `notifications`
+--
+
+DROP TABLE IF EXISTS `notifications`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `notifications` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `user_id` int NOT NULL,
+  `kind` enum('reminder','award') NOT NULL,
+  `title` varchar(255) NOT NULL,
+  `body` varchar(1000) NOT NULL,
+  `task_id` int DEFAULT NULL,
+  `dedupe_key` varchar(64) DEFAULT NULL,
+  `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uniq_notifications_dedupe` (`user_id`,`dedupe_key`),
+  KEY `idx_notifications_user` (`user_id`,`id`),
+  KEY `fk_notifications_task` (`task_id`),
+  CONSTRAINT `fk_notifications_task` FOREIGN KEY (`task_id`) REFERENCES `tasks` (`id`) ON DELETE SET NULL,
+  CONSTRAINT `fk_notifications_user` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
 --
 -- Table structure for table `purchases`
 --
@@ -30,7 +124,7 @@ CREATE TABLE `purchases` (
   `cost_at_purchase` int NOT NULL,
   PRIMARY KEY (`id`),
   KEY `idx_purchases_student` (`student_id`),
-  KEY `fk_purchases_reward` (`reward_id`),
+  KEY `idx_purchases_reward_student` (`reward_id`,`student_id`),
   CONSTRAINT `fk_purchases_reward` FOREIGN KEY (`reward_id`) REFERENCES `rewards` (`id`) ON DELETE SET NULL,
   CONSTRAINT `fk_purchases_student` FOREIGN KEY (`student_id`) REFERENCES `users` (`id`) ON DELETE SET NULL
 ) ENGINE=InnoDB AUTO_INCREMENT=22 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
@@ -57,6 +151,24 @@ CREATE TABLE `reminder_logs` (
 ) ENGINE=InnoDB AUTO_INCREMENT=13 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
+--
+-- Table structure for table `reminder_schedule`
+--
+
+DROP TABLE IF EXISTS `reminder_schedule`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `reminder_schedule` (
+  `task_id` int NOT NULL,
+  `reminder_type` enum('24h','12h') NOT NULL,
+  `fire_at` datetime NOT NULL,
+  `fired_at` datetime DEFAULT NULL,
+  PRIMARY KEY (`task_id`,`reminder_type`),
+  KEY `idx_reminder_schedule_due` (`fired_at`,`fire_at`),
+  CONSTRAINT `fk_reminder_schedule_task` FOREIGN KEY (`task_id`) REFERENCES `tasks` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
 --
 -- Table structure for table `reward_purchase_ledger`
 --
@@ -80,16 +192,34 @@ CREATE TABLE `reward_purchase_ledger` (
   `purchased_at` datetime NOT NULL,
   `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
   PRIMARY KEY (`id`),
-  KEY `fk_ledger_reward` (`reward_id`),
+  KEY `idx_ledger_reward` (`reward_id`,`purchased_at`,`id`),
   KEY `idx_ledger_purchase` (`purchase_id`),
-  KEY `idx_ledger_student` (`student_id`),
-  KEY `idx_ledger_purchased_at` (`purchased_at`),
+  KEY `idx_ledger_student` (`student_id`,`purchased_at`,`id`),
+  KEY `idx_ledger_purchased_at` (`purchased_at`,`id`),
   CONSTRAINT `fk_ledger_purchase` FOREIGN KEY (`purchase_id`) REFERENCES `purchases` (`id`) ON DELETE SET NULL,
   CONSTRAINT `fk_ledger_reward` FOREIGN KEY (`reward_id`) REFERENCES `rewards` (`id`) ON DELETE SET NULL,
   CONSTRAINT `fk_ledger_student` FOREIGN KEY (`student_id`) REFERENCES `users` (`id`) ON DELETE SET NULL
 ) ENGINE=InnoDB AUTO_INCREMENT=12 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
+--
+-- Table structure for table `reward_sales_daily`
+--
+
+DROP TABLE IF EXISTS `reward_sales_daily`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `reward_sales_daily` (
+  `reward_id` int NOT NULL,
+  `day` date NOT NULL,
+  `reward_title` varchar(255) NOT NULL,
+  `purchases` int NOT NULL DEFAULT '0',
+  `points_spent` int NOT NULL DEFAULT '0',
+  PRIMARY KEY (`reward_id`,`day`),
+  KEY `idx_reward_sales_daily_day` (`day`,`reward_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
 --
 -- Table structure for table `rewards`
 --
@@ -102,6 +232,8 @@ CREATE TABLE `rewards` (
   `title` varchar(255) NOT NULL,
   `description` text,
   `cost` int NOT NULL DEFAULT '0',
+  `stock` int DEFAULT NULL,
+  `per_student_limit` int DEFAULT NULL,
   `created_by` int NOT NULL,
   `active` tinyint(1) NOT NULL DEFAULT '1',
   `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
@@ -112,6 +244,23 @@ CREATE TABLE `rewards` (
 ) ENGINE=InnoDB AUTO_INCREMENT=21 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
+--
+-- Table structure for table `student_daily_points`
+--
+
+DROP TABLE IF EXISTS `student_daily_points`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `student_daily_points` (
+  `student_id` int NOT NULL,
+  `day` date NOT NULL,
+  `points` int NOT NULL DEFAULT '0',
+  PRIMARY KEY (`student_id`,`day`),
+  KEY `idx_student_daily_points_day` (`day`,`student_id`),
+  CONSTRAINT `fk_student_daily_points_student` FOREIGN KEY (`student_id`) REFERENCES `users` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
 --
 -- Table structure for table `submissions`
 --
@@ -131,12 +280,32 @@ CREATE TABLE `submissions` (
   `awarded_at` datetime DEFAULT NULL,
   PRIMARY KEY (`id`),
   KEY `idx_submissions_task` (`task_id`),
-  KEY `idx_submissions_student` (`student_id`),
+  KEY `idx_submissions_student_task` (`student_id`,`task_id`,`submitted_at`),
   CONSTRAINT `fk_submissions_student` FOREIGN KEY (`student_id`) REFERENCES `users` (`id`) ON DELETE CASCADE,
   CONSTRAINT `fk_submissions_task` FOREIGN KEY (`task_id`) REFERENCES `tasks` (`id`) ON DELETE CASCADE
 ) ENGINE=InnoDB AUTO_INCREMENT=31 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
+--
+-- Table structure for table `task_student_scores`
+--
+
+DROP TABLE IF EXISTS `task_student_scores`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `task_student_scores` (
+  `student_id` int NOT NULL,
+  `task_id` int NOT NULL,
+  `best_points` int NOT NULL,
+  `awarded_at` datetime DEFAULT NULL,
+  `updated_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`student_id`,`task_id`),
+  KEY `idx_task_student_scores_task` (`task_id`),
+  CONSTRAINT `fk_task_student_scores_student` FOREIGN KEY (`student_id`) REFERENCES `users` (`id`) ON DELETE CASCADE,
+  CONSTRAINT `fk_task_student_scores_task` FOREIGN KEY (`task_id`) REFERENCES `tasks` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
 --
 -- Table structure for table `task_assignments`
 --
@@ -178,7 +347,8 @@ CREATE TABLE `tasks` (
   `created_by` int DEFAULT NULL,
   `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
   `updated_at` datetime DEFAULT NULL,
-  PRIMARY KEY (`id`)
+  PRIMARY KEY (`id`),
+  KEY `idx_tasks_deadline` (`deadline`)
 ) ENGINE=InnoDB AUTO_INCREMENT=35 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
@@ -196,9 +366,11 @@ CREATE TABLE `users` (
   `password` varchar(255) NOT NULL,
   `role` enum('tutor','student') NOT NULL,
   `points` int NOT NULL DEFAULT '0',
+  `earned_points` int NOT NULL DEFAULT '0',
   PRIMARY KEY (`id`),
   UNIQUE KEY `username` (`username`),
-  UNIQUE KEY `email` (`email`)
+  UNIQUE KEY `email` (`email`),
+  KEY `idx_users_role_earned` (`role`,`earned_points`,`username`)
 ) ENGINE=InnoDB AUTO_INCREMENT=21 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
 